@@ -0,0 +1,191 @@
+# ================================================= #
+# Author: Samuel Law                                #
+# Title: Line Crossing Game - asyncio loop          #
+#                                                   #
+# Description:                                      #
+# Runs rounds as asyncio tasks so many games and    #
+# input sources can share one process               #
+# ================================================= #
+
+import asyncio
+from timeit import default_timer as now
+from pytron import Game, Player, FrameScheduler, TurtleRenderer
+
+
+# ================== classes ==================
+class InputQueue():
+    """A single queue of (player, action) events that every input
+    source feeds: key bindings, scripts, bots and sockets"""
+    # class wide variables
+    actions = ('left', 'right', 'pause')
+
+    # methods
+    def __init__(self):
+        self.queue = asyncio.Queue()
+
+    def put(self, player, action):
+        """Adds an event, safe to call from Tk callbacks"""
+        self.queue.put_nowait((player, action))
+
+    def drain(self):
+        """Returns every event waiting in the queue"""
+        events = []
+        while not self.queue.empty():
+            events.append(self.queue.get_nowait())
+        return events
+
+    async def get(self, timeout=None):
+        """Waits for the next event, returns None on timeout"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class AsyncGameLoop():
+    """Owns the tick scheduling, input and end of round prompt
+    of one game as coroutines. Events from the InputQueue are
+    applied between ticks, Tk (if a renderer is attached) is
+    pumped whenever a frame is drawn. With realtime off the game
+    ticks as fast as possible, yielding to the event loop after
+    every tick so other games keep running."""
+
+    # methods
+    def __init__(self, game, inputs=None, scheduler=None, realtime=True, script=()):
+        self.game = game
+        self.inputs = inputs or InputQueue()
+        self.scheduler = scheduler or FrameScheduler()
+        self.realtime = realtime
+        self.script = {}  # holds tick -> [(player, action), ...]
+        for tick, player, action in script:
+            self.script.setdefault(tick, []).append((player, action))
+        game.input_sink = self.inputs.put  # key presses go through the queue
+
+    def apply(self, player, action):
+        """Applies a queued event to the game, events for
+        unknown players or actions are dropped"""
+        if action not in InputQueue.actions:
+            return
+        if (action != 'pause') and not (isinstance(player, int) and 0 <= player < len(self.game.player_list)):
+            return
+        self.game.handle_input(player, action)
+
+    def apply_inputs(self):
+        """Applies the scripted and queued events due
+        before the next tick, a tick's script is used up
+        the first time so it is only applied once"""
+        for player, action in self.script.pop(self.game.tick_count, ()):
+            self.apply(player, action)
+        for player, action in self.inputs.drain():
+            self.apply(player, action)
+
+    async def run(self):
+        """Plays the round, returns the game once it is over"""
+        game, scheduler = self.game, self.scheduler
+        if not self.realtime:
+            while True:
+                self.apply_inputs()
+                if game.is_over():
+                    return game
+                if game.paused:  # nothing to do until the next event
+                    self.apply(*await self.inputs.get())
+                else:
+                    game.tick()
+                    await asyncio.sleep(0)  # let the other tasks run
+        scheduler.start(now())
+        while True:
+            t = now()
+            self.apply_inputs()
+            for _ in range(scheduler.advance(t, game.paused)):
+                game.tick()
+                if game.is_over():
+                    game.render()
+                    return game
+                self.apply_inputs()
+            if scheduler.render_due(t):
+                game.render()  # draws and pumps Tk
+            await asyncio.sleep(scheduler.sleep_time(now(), game.paused))
+
+    async def prompt_play_again(self):
+        """Asks "Play Again? [y/n]" and waits for the answer
+        without blocking the event loop, headless games
+        answer with a 'yes' or 'no' event"""
+        game = self.game
+        game.onkey(lambda: self.inputs.put(None, 'yes'), 'y')
+        game.onkey(lambda: self.inputs.put(None, 'no'), 'n')
+        if game.renderer:
+            game.renderer.write("Play Again? [y/n]")
+        while game.play_again is None:
+            event = await self.inputs.get(timeout=self.scheduler.render_dt)
+            if event and event[1] in ('yes', 'no'):
+                game.play_again = event[1] == 'yes'
+            if game.renderer:
+                game.renderer.update()  # pump Tk
+        game.onkey(None, 'y')
+        game.onkey(None, 'n')
+        return game.play_again
+
+
+# ================== input sources ==================
+def parse_input(line):
+    """Returns the (player, action) of a line such as
+    "0 left" or "pause", None if it can't be read"""
+    parts = line.split()
+    if parts == ['pause']:
+        return (None, 'pause')
+    if parts in (['yes'], ['no']):
+        return (None, parts[0])
+    if len(parts) == 2 and parts[0].isdigit():
+        return (int(parts[0]), parts[1])
+
+
+async def serve_inputs(inputs, host='127.0.0.1', port=0):
+    """Stand in for remote players, every line sent to the
+    returned asyncio server is parsed with parse_input and
+    put on inputs. Use port 0 to pick any free port."""
+    async def handle(reader, writer):
+        while line := await reader.readline():
+            event = parse_input(line.decode(errors='replace'))
+            if event:
+                inputs.put(*event)
+        writer.close()
+    return await asyncio.start_server(handle, host, port)
+
+
+# ================== functions ==================
+async def play_pytron_async(key_bindings, inputs=None):
+    """Same as play_pytron but runs as a coroutine, extra
+    input sources can feed inputs alongside the keyboard"""
+    import turtle
+    from tkinter import TclError
+    renderer = None
+    try:
+        turtle.speed(0)           # no animations
+        turtle.delay(0)           # no delays
+        turtle.Screen().clear()   # reset screen
+        turtle.title('pytron')    # add a title
+        game = Game()             # create a new game object
+        renderer = TurtleRenderer()
+        game.attach_renderer(renderer)
+
+        for binding in key_bindings:  # add players
+            game.add_player(Player(key_bindings=binding))
+
+        game.setup_players()                   # set up the players
+        loop = AsyncGameLoop(game, inputs)     # keys now feed the queue
+        game.renderer.listen()                 # start listening for events
+        await loop.run()                       # play the round
+        return await loop.prompt_play_again()  # returns boolean value
+    except (TclError, turtle.Terminator):
+        pass
+    finally:
+        if renderer:
+            renderer.detach()
+
+
+async def play_headless_games(games, realtime=False):
+    """Plays every game at once on the running event
+    loop and returns them when they are all over"""
+    for game in games:
+        game.paused = False
+    return await asyncio.gather(*(AsyncGameLoop(game, realtime=realtime).run() for game in games))
@@ -0,0 +1,96 @@
+# ================================================= #
+# Author: Samuel Law                                #
+# Title: Line Crossing Game - batch mode            #
+#                                                   #
+# Description:                                      #
+# Runs many seeded headless rounds across a         #
+# process pool for bot evaluation and balancing     #
+# ================================================= #
+
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from os import cpu_count
+from random import Random
+from pytron import Game, Player
+
+
+# ================== records ==================
+GameConfig = namedtuple(
+    'GameConfig',
+    ['seed', 'n_players', 'width', 'height', 'inputs', 'bot', 'max_ticks', 'controllers'],
+    defaults=[0, 2, None, None, (), None, 100_000, ()]
+)
+GameConfig.__doc__ = """Describes one headless round.
+inputs holds scripted (tick, player, 'left'|'right') key presses,
+applied once tick ticks have been played. bot is a module level
+function bot(game, player, rng) -> 'left'|'right'|None called for
+every movable player before each tick, rng is seeded by seed.
+controllers holds a factory per player, called as factory(seed=...)
+with a seed drawn from rng, that returns the player's Controller
+or None for keys only. Factories must be picklable, such as module
+level classes or functions and partials of them."""
+
+GameResult = namedtuple('GameResult', ['seed', 'winner', 'scores', 'ticks', 'deaths'])
+GameResult.__doc__ = """Outcome of one headless round. winner is the
+player number (starting at 1) or None for a draw, deaths holds
+(tick, x, y) for each player or None if they survived."""
+
+
+# ================== bots ==================
+def random_bot(game, player, rng):
+    """Turns at random roughly every 20 ticks"""
+    if rng.random() < 0.05:
+        return rng.choice(('left', 'right'))
+
+
+# ================== functions ==================
+def play_headless(config):
+    """Plays the round described by config and
+    returns its GameResult"""
+    rng = Random(config.seed)
+    game = Game(width=config.width, height=config.height)
+    for i in range(config.n_players):  # add players
+        factory = config.controllers[i] if i < len(config.controllers) else None
+        game.add_player(Player(controller=factory(seed=rng.randrange(2**32)) if factory else None))
+    game.setup_players()  # set up the players
+    game.paused = False
+
+    # group the scripted key presses by tick
+    inputs = {}
+    for tick, i, action in config.inputs:
+        inputs.setdefault(tick, []).append((i, action))
+
+    deaths = [None for _ in game.player_list]
+    while not game.is_over() and game.tick_count < config.max_ticks:
+        presses = list(inputs.get(game.tick_count, ()))
+        if config.bot:
+            presses += [(i, config.bot(game, p, rng)) for i, p in enumerate(game.player_list) if p.movable]
+        for i, action in presses:
+            if action:
+                game.handle_input(i, action)
+        game.tick()
+        # note where each player died
+        for i, p in enumerate(game.player_list):
+            if not (p.movable or deaths[i]):
+                deaths[i] = (game.tick_count, *p.get_pos())
+
+    alive = [i for i, p in enumerate(game.player_list, start=1) if p.movable]
+    return GameResult(
+        seed=config.seed,
+        winner=alive[0] if len(alive) == 1 else None,
+        scores=tuple(p.score for p in game.player_list),
+        ticks=game.tick_count,
+        deaths=tuple(deaths)
+    )
+
+
+def play_pytron_batch(configs, max_workers=None, chunksize=None):
+    """Plays every GameConfig in configs headless across a
+    process pool and returns the GameResults in the same order.
+    Rounds are handed out in chunks so each worker spends its
+    time playing rather than waiting on the pool."""
+    configs = list(configs)
+    max_workers = max_workers or cpu_count() or 1
+    chunksize = chunksize or max(1, len(configs)//(max_workers*4))
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(play_headless, configs, chunksize=chunksize))
@@ -0,0 +1,214 @@
+# ================================================= #
+# Author: Samuel Law                                #
+# Title: Line Crossing Game - benchmarks            #
+#                                                   #
+# Description:                                      #
+# Times the hot paths of the game on generated      #
+# traces with no display and writes one JSON        #
+# record per case so regressions can be caught      #
+# ================================================= #
+
+import json
+import platform
+import sys
+from argparse import ArgumentParser
+from array import array
+from statistics import mean
+from timeit import default_timer as now
+from pytron import Game, Player
+from parallel import lane_game
+try:
+    import numpy as np  # only needed for the vectorized case
+except ImportError:
+    np = None
+
+
+# ================== settings ==================
+VERTICES = [1_000, 10_000, 100_000, 1_000_000]  # trace lengths per player
+PLAYERS = [2, 4, 8, 16, 32, 64]                 # player counts
+QUICK_VERTICES = [1_000, 10_000]
+QUICK_PLAYERS = [2, 8]
+ROW_WIDTH = 32.0  # width of the generated zig zag traces
+ROW_STEP = 4.0    # distance between the rows of a zig zag
+
+
+# ================== trace generation ==================
+def zig_zag(n, x0=0.0, y0=0.0, width=ROW_WIDTH, step=ROW_STEP):
+    """Returns x & y arrays of a trace with n vertices that
+    zig zags upwards from x0, y0 without crossing itself.
+    Sizes are in pixels, the arrays in units like a Player's."""
+    units = Player.units
+    x_vec = array('i', (round(((x0 + width) if (k % 4 in (1, 2)) else x0)*units) for k in range(n)))
+    y_vec = array('i', (round((y0 + (k//2)*step)*units) for k in range(n)))
+    return x_vec, y_vec
+
+
+def make_game(n_players, n_vertices):
+    """Returns a game where each player has already traced
+    n_vertices in their own band and is heading off into open
+    space, all closed segments are already indexed"""
+    band = (n_vertices//2 + 2)*ROW_STEP + 8*Player.base_distance
+    game = Game(width=1e9, height=1e9)  # never hit the border
+    for i in range(n_players):
+        p = Player()
+        x0, y0 = -ROW_WIDTH/2, i*band - (n_players*band)/2
+        p.x_vec, p.y_vec = zig_zag(n_vertices, x0, y0)
+        p.x, p.y = p.x_vec[-1], p.y_vec[-1]
+        # carry on along the last row, away from the zig zag
+        p.heading = 0 if (n_vertices % 4 in (1, 2)) else 180
+        game.add_player(p)
+    game.paused = False
+    [p.move() for p in game.player_list]
+    game.check_for_line_intersections()  # index the traces
+    return game
+
+
+def make_field_game(n_players, collisions):
+    """Returns a lane_game of n_players, 50 ticks in"""
+    game = lane_game(n_players, collisions)
+    [game.tick() for _ in range(50)]
+    return game
+
+
+# ================== timing ==================
+def measure(fun, number, repeat):
+    """Returns the best and mean time of one call to fun"""
+    times = []
+    for _ in range(repeat):
+        start = now()
+        for _ in range(number):
+            fun()
+        times.append((now() - start)/number)
+    return min(times), mean(times)
+
+
+def move_and_check(game):
+    """One tick of movement followed by the line checks"""
+    [p.move() for p in game.player_list]
+    game.check_for_line_intersections()
+
+
+def cases(vertices, players):
+    """Yields (bench, n_vertices, n_players, setup) for every case, setup
+    returns the function to time and the number of calls per repeat"""
+    for n in vertices:
+        calls = max(1, 10_000//n)
+
+        def reference(n=n, calls=calls):
+            game = make_game(2, n)
+            x_vec, y_vec = game.player_list[0].get_trace()
+            return (lambda: game.line_intersection_detected(x_vec, y_vec, [1e6, 1e6 + 1], [0, 0])), calls
+        yield 'line_intersection_detected', n, 2, reference
+
+        if np is not None:
+            def vectorized(n=n):
+                game = make_game(2, n)
+                x_vec, y_vec = game.player_list[0].get_trace()
+                return (lambda: game.line_intersection_detected_np(x_vec, y_vec, [1e6, 1e6 + 1], [0, 0])), 10
+            yield 'line_intersection_detected_np', n, 2, vectorized
+
+        def get_trace(n=n):
+            p = make_game(1, n).player_list[0]
+            return p.get_trace, 10_000
+        yield 'get_trace', n, 1, get_trace
+
+        def sync(n=n):
+            game = make_game(2, n)
+            traces = [p.get_trace() for p in game.player_list]
+
+            def fun():
+                game.segment_grid.clear()
+                [game.segment_grid.sync(i, *t) for i, t in enumerate(traces)]
+            return fun, 1
+        yield 'segment_grid_sync', n, 2, sync
+
+        def snapshot_restore(n=n):
+            game = make_game(2, n)
+
+            def fun():
+                snapshot = game.snapshot()
+                game.player_list[0].turn_left()
+                game.restore(snapshot)
+            return fun, 1_000
+        yield 'snapshot_restore', n, 2, snapshot_restore
+
+        for incremental in (True, False):
+            def check(n=n, incremental=incremental):
+                game = make_game(2, n)
+                game.incremental_collisions = incremental
+                return (lambda: move_and_check(game)), 100
+            yield ('check_for_line_intersections' if incremental else 'check_for_line_intersections_full'), n, 2, check
+
+    for n_players in players:
+        def border(n_players=n_players):
+            game = make_game(n_players, 1_000)
+            return game.check_for_border_collisions, 1_000
+        yield 'check_for_border_collisions', 1_000, n_players, border
+
+        def tick(n_players=n_players):
+            game = make_game(n_players, 1_000)
+            return game.tick, 100
+        yield 'tick', 1_000, n_players, tick
+
+        for collisions in ('segments', 'occupancy'):
+            def field_tick(n_players=n_players, collisions=collisions):
+                game = make_field_game(n_players, collisions)
+                return game.tick, 100
+            yield f'tick_{collisions}', None, n_players, field_tick
+
+
+def run(vertices, players, repeat=5, out=sys.stdout):
+    """Runs every case and writes one JSON record per line,
+    returns the records"""
+    records = []
+    meta = {'bench': 'meta', 'python': platform.python_version(),
+            'machine': platform.machine(), 'numpy': np.__version__ if np else None}
+    out.write(json.dumps(meta) + '\n')
+    for bench, n, n_players, setup in cases(vertices, players):
+        fun, number = setup()
+        best, avg = measure(fun, number, repeat)
+        record = {'bench': bench, 'vertices': n, 'players': n_players,
+                  'number': number, 'repeat': repeat, 'best_s': best, 'mean_s': avg}
+        out.write(json.dumps(record) + '\n')
+        out.flush()
+        records.append(record)
+    return records
+
+
+def compare(records, baseline_path, threshold):
+    """Returns the records that are more than threshold
+    times slower than the same case in the baseline file"""
+    with open(baseline_path) as f:
+        baseline = [json.loads(line) for line in f if line.strip()]
+    key = lambda r: (r['bench'], r.get('vertices'), r.get('players'))
+    best = {key(r): r['best_s'] for r in baseline if r['bench'] != 'meta'}
+    return [r for r in records if key(r) in best and r['best_s'] > threshold*best[key(r)]]
+
+
+def main(argv=None):
+    parser = ArgumentParser(description="Benchmarks the pytron hot paths")
+    parser.add_argument('--quick', action='store_true', help="only the small cases")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help="file to write the JSON records to")
+    parser.add_argument('--compare', help="baseline JSON records to check against")
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help="slowdown against the baseline that counts as a regression")
+    args = parser.parse_args(argv)
+
+    vertices, players = (QUICK_VERTICES, QUICK_PLAYERS) if args.quick else (VERTICES, PLAYERS)
+    out = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        records = run(vertices, players, args.repeat, out)
+    finally:
+        if args.output:
+            out.close()
+    if args.compare:
+        regressions = compare(records, args.compare, args.threshold)
+        for r in regressions:
+            sys.stderr.write(f"regression: {r['bench']} vertices={r['vertices']} players={r['players']}\n")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,377 @@
+# ================================================= #
+# Author: Samuel Law                                #
+# Title: Line Crossing Game - bots                  #
+#                                                   #
+# Description:                                      #
+# Lookahead simulator and bots that play through    #
+# the Controller interface                          #
+# ================================================= #
+
+from math import floor
+from random import Random
+from timeit import default_timer as now
+from pytron import Controller, Player, swept_tail
+
+
+# ================== functions ==================
+def crossing(ax, ay, bx, by, xt, yt, x_min, x_max, y_min, y_max):
+    """Same as Game.segment_intersection of the segment from a to b
+    (a single point if they are equal) and a tail with bounding box
+    x_min, x_max, y_min, y_max, where xt & yt are the tail's x if it
+    is vertical and its y if it is horizontal, else 0"""
+    x = (ax if ax == bx else 0) + xt
+    if not ((x_min <= x <= x_max) and ((ax <= x <= bx) if ax <= bx else (bx <= x <= ax))):
+        return None
+    y = (ay if ay == by else 0) + yt
+    if (y_min <= y <= y_max) and ((ay <= y <= by) if ay <= by else (by <= y <= ay)):
+        return (x, y)
+
+
+# ================== classes ==================
+class ForkedTrace():
+    """A trace during a rollout: a player's vertex buffer, shared,
+    followed by a list of the vertices the rollout added and the
+    head. Indexes and slices like a TraceView, so the game's checks
+    can be run on it, slices are returned as new lists."""
+    __slots__ = ('base', 'added')
+
+    # methods
+    def __init__(self, base, added):
+        self.base = base    # the game's buffer, not to be modified
+        self.added = added  # vertices after it
+
+    def __len__(self):
+        return len(self.base) + len(self.added)
+
+    def __getitem__(self, index):
+        base, added = self.base, self.added
+        if index.__class__ is int:  # mostly the head or the last vertex
+            if index < 0:
+                return added[index] if -index <= len(added) else base[index + len(added)]
+            return base[index] if index < len(base) else added[index - len(base)]
+        n = len(base)
+        start, stop, _ = index.indices(n + len(added))  # the checks only slice with step 1
+        if start >= n:
+            return added[start-n:max(stop-n, 0)]
+        if stop <= n:
+            return base[start:stop].tolist()
+        return base[start:].tolist() + added[:stop-n]
+
+    def __iter__(self):
+        yield from self.base
+        yield from self.added
+
+
+class Lookahead():
+    """Clone and step simulator of a game, for bots searching ahead.
+    The traces the game has so far are shared, not copied, only the
+    vertices added by turns are held per rollout, so reset costs the
+    same however long the traces are. Steps follow the same rules as
+    Game.tick and freeze the same players. A step only looks at the
+    tails swept that tick: each is tested against the indexed segments
+    in the cells of the game's segment grid it covers, which is only
+    read, and against the few vertices after them, held in flat lists
+    so no traces or boxes are built per step. With reference set every
+    check goes through the game's own swept_tail and tail_freezes on
+    ForkedTraces instead, slower and kept to test the fast step against.
+    With the occupancy backend the heads are checked by the game's
+    cell_freezes, on the game's own OccupancyGrid: the cells a rollout
+    marks are freed again by reset and at the end of rollout. The
+    game must not tick while a Lookahead of it is in use."""
+
+    # methods
+    def __init__(self, game, reference=False):
+        self.game = game
+        self.reference = reference
+        self.game_over_limit = game.game_over_limit
+        self.x_limit, self.y_limit = game.x_limit, game.y_limit
+        self.incremental = game.incremental_collisions
+        players = game.player_list
+        self.base_distance = [p.base_distance for p in players]
+        self.schedules = [p.speed_schedule for p in players]
+        self.x_base = [p.x_vec for p in players]  # shared vertex buffers
+        self.y_base = [p.y_vec for p in players]
+        self.start = [(p.x, p.y, p.heading, p.distance_per_loop, p.score, p.movable) for p in players]
+        self.start_tails = dict(game.tail_state)
+        self.occupancy = game.occupancy
+        self.start_cells = game.occupancy.snapshot() if game.occupancy is not None else None
+        # segments below indexed are in the game's grid, the fast step
+        # holds the vertices from live on, which covers every check
+        grid = game.segment_grid
+        self.cells, self.cell_size = grid.cells, grid.cell_size
+        self.indexed = [grid.counts.get(i, 0) for i in range(len(players))]
+        self.live = [min(k, max(len(x_vec) - 4, 0)) for k, x_vec in zip(self.indexed, self.x_base)]
+        self.reset()
+
+    def reset(self):
+        """Goes back to the state of the game when
+        the Lookahead was made"""
+        if self.occupancy is not None:
+            self.occupancy.restore(self.start_cells)
+        self.x, self.y, self.heading, self.dist, self.score, self.movable = (list(v) for v in zip(*self.start))
+        self.x_added = [[] for _ in self.x_base]  # vertices added by turns
+        self.y_added = [[] for _ in self.y_base]
+        self.tail_state = dict(self.start_tails)
+        self.ticks = 0
+        n = len(self.x_base)
+        self.speed_from, self.speed_until = [0.0]*n, [0.0]*n  # score range of the speed, empty at first
+        self.speed, self.speed_units = [0.0]*n, [0]*n
+        # the fast step's vertices from live on, its tails and what was last swept
+        self.x_live = [x_vec[k:].tolist() for k, x_vec in zip(self.live, self.x_base)]
+        self.y_live = [y_vec[k:].tolist() for k, y_vec in zip(self.live, self.y_base)]
+        self.tails = [None]*n
+        self.swept = [self.start_tails.get(i) for i in range(n)]
+        self.boxes = []  # holds [x_min, x_max, y_min, y_max] of the vertices the grid hasn't indexed
+        for i in range(n):
+            k = self.indexed[i] - self.live[i]
+            x_vec, y_vec = self.x_live[i][k:], self.y_live[i][k:]
+            self.boxes.append([min(x_vec), max(x_vec), min(y_vec), max(y_vec)])
+
+    def turn(self, i, action):
+        """Same as a key press, 'left' or 'right' for player i"""
+        self.heading[i] = (self.heading[i] + (90 if action == 'left' else -90)) % 360
+        self.x_added[i].append(self.x[i])
+        self.y_added[i].append(self.y[i])
+        self.x_live[i].append(self.x[i])
+        self.y_live[i].append(self.y[i])
+        box = self.boxes[i]
+        box[:] = min(box[0], self.x[i]), max(box[1], self.x[i]), min(box[2], self.y[i]), max(box[3], self.y[i])
+
+    def is_over(self):
+        return sum(self.movable) <= self.game_over_limit
+
+    def step(self, actions=()):
+        """Applies the (player, action) turns and plays one tick"""
+        for i, action in actions:
+            if action:
+                self.turn(i, action)
+        units, directions = Player.units, Player.directions
+        score, dist_, movable = self.score, self.dist, self.movable
+        speed_from, speed_until = self.speed_from, self.speed_until
+        for i in range(len(self.x)):  # same order as Game.tick
+            points = score[i] = score[i] + dist_[i]
+            if not (speed_from[i] <= points < speed_until[i]):  # as Player.set_speed
+                schedule = self.schedules[i]
+                level = schedule.level(points)
+                speed_from[i], speed_until[i] = schedule.span(level)
+                self.speed[i] = self.base_distance[i]*schedule.multiplier(level)
+                self.speed_units[i] = round(self.speed[i]*units)
+            if movable[i]:
+                dist_[i], distance = self.speed[i], self.speed_units[i]
+            else:
+                dist_[i], distance = 0.0, 0
+            dx, dy = directions[self.heading[i]]
+            x, y = self.x[i] + dx*distance, self.y[i] + dy*distance
+            self.x[i], self.y[i] = x, y
+            if (abs(x) >= self.x_limit) or (abs(y) >= self.y_limit):
+                movable[i] = 0
+        if self.reference or (self.occupancy is not None):
+            self.check_for_line_intersections()
+        else:
+            self.check_swept_segments()
+        self.ticks += 1
+
+    def trace(self, i):
+        """Returns the trace of player i like Player.get_trace"""
+        x_vec, y_vec = self.x_added[i], self.y_added[i]
+        x, y = self.x[i], self.y[i]
+        if (x, y) != ((x_vec[-1], y_vec[-1]) if x_vec else (self.x_base[i][-1], self.y_base[i][-1])):
+            x_vec, y_vec = x_vec + [x], y_vec + [y]  # with the head
+        return ForkedTrace(self.x_base[i], x_vec), ForkedTrace(self.y_base[i], y_vec)
+
+    def check_for_line_intersections(self):
+        """Same as Game.check_for_line_intersections, with
+        the segments closed since the Lookahead was made
+        checked as the game checks those not indexed yet"""
+        game, indices = self.game, range(len(self.x))
+        traces = [self.trace(i) for i in indices]
+        if self.occupancy is not None:
+            for j in game.cell_freezes(traces):
+                self.movable[j] = 0
+            return
+        tails = [swept_tail(self.tail_state, i, *traces[i], self.incremental) for i in indices]
+        live_boxes = [game.live_box(i, *traces[i]) for i in indices]
+        for i in indices:
+            for j in game.tail_freezes(i, traces, tails[i], live_boxes):
+                self.movable[j] = 0
+
+    def sweep_tails(self):
+        """Same as swept_tail for every player, the part of each
+        tail to check is held in tails as (x0, y0, x1, y1), or None"""
+        x_live, y_live, live, swept, tails = self.x_live, self.y_live, self.live, self.swept, self.tails
+        for i in range(len(tails)):
+            x_vec, y_vec, x1, y1 = x_live[i], y_live[i], self.x[i], self.y[i]
+            n = live[i] + len(x_vec)  # vertices of the trace
+            if (x1 != x_vec[-1]) or (y1 != y_vec[-1]):
+                n, x0, y0 = n + 1, x_vec[-1], y_vec[-1]  # the head is the trace's last point
+            elif n > 1:  # live holds the last two vertices of any longer trace
+                x0, y0 = x_vec[-2], y_vec[-2]
+            else:  # a single point
+                swept[i], tails[i] = None, (x1, y1, x1, y1)
+                continue
+            previous = swept[i]
+            swept[i] = (n, x0, y0, x1, y1)
+            if not self.incremental or (previous is None) or (previous[:3] != (n, x0, y0)):
+                tails[i] = (x0, y0, x1, y1)
+            elif previous[3:] == (x1, y1):
+                tails[i] = None  # didn't move
+            elif (x0 == x1 or y0 == y1) and (min(x0, x1) <= previous[3] <= max(x0, x1)) \
+                    and (min(y0, y1) <= previous[4] <= max(y0, y1)):
+                tails[i] = (previous[3], previous[4], x1, y1)
+            else:
+                tails[i] = (x0, y0, x1, y1)
+
+    def check_swept_segments(self):
+        """Fast version of check_for_line_intersections, freezes the
+        same players as Game.tail_freezes would. Each swept tail is
+        tested against the indexed segments in the grid cells it
+        covers, then against the vertices the grid hasn't indexed, the
+        first hit in trace order decides who is closer as in the game."""
+        self.sweep_tails()
+        x_live, y_live, live, indexed = self.x_live, self.y_live, self.live, self.indexed
+        x_base, y_base, xs, ys, cells, c = self.x_base, self.y_base, self.x, self.y, self.cells, self.cell_size
+        boxes = self.boxes
+        n_players = len(xs)
+        lengths = [live[j] + len(x_live[j]) + ((xs[j] != x_live[j][-1]) or (ys[j] != y_live[j][-1]))
+                   for j in range(n_players)]  # points of each trace, with the head if it is off the last vertex
+        frozen = []
+        for i, tail in enumerate(self.tails):
+            if tail is None:
+                continue
+            tx0, ty0, tx1, ty1 = tail
+            x_min, x_max = (tx0, tx1) if tx0 <= tx1 else (tx1, tx0)
+            y_min, y_max = (ty0, ty1) if ty0 <= ty1 else (ty1, ty0)
+            xt, yt = (tx0 if tx0 == tx1 else 0), (ty0 if ty0 == ty1 else 0)  # as segment_intersection
+            own_stop = max(lengths[i] - 3, 0)
+            own_indexed = min(indexed[i], max(own_stop - 1, 0))
+            # the indexed segments near the tail, keeping the first hit of each trace
+            hit, first = False, {}
+            for cx in range(floor(x_min/c), floor(x_max/c) + 1):
+                for cy in range(floor(y_min/c), floor(y_max/c) + 1):
+                    for j, k in cells.get((cx, cy), ()):
+                        if j == i:
+                            if (k >= own_indexed) or hit:
+                                continue
+                        elif (k >= min(indexed[j], lengths[j] - 1)) or ((j in first) and (k >= first[j][0])):
+                            continue
+                        point = crossing(x_base[j][k], y_base[j][k], x_base[j][k+1], y_base[j][k+1],
+                                         xt, yt, x_min, x_max, y_min, y_max)
+                        if point is None:
+                            continue
+                        if j == i:
+                            hit = True
+                        else:
+                            first[j] = (k, point)
+            # the rest of own trace, the last 3 points are never checked
+            if not hit:
+                hit = self.live_crossing(i, own_indexed, own_stop, xt, yt, x_min, x_max, y_min, y_max)
+            if hit:
+                frozen.append(i)
+                continue
+            for j in range(n_players):
+                if j == i:
+                    continue
+                box, x, y = boxes[j], xs[j], ys[j]
+                if (j not in first) and ((x_max < box[0] and x_max < x) or (box[1] < x_min and x < x_min)
+                                         or (y_max < box[2] and y_max < y) or (box[3] < y_min and y < y_min)):
+                    continue  # nothing of player j's trace near the tail, as with Game.live_box
+                point = first[j][1] if j in first else \
+                    self.live_crossing(j, min(indexed[j], lengths[j] - 1), lengths[j],
+                                       xt, yt, x_min, x_max, y_min, y_max)
+                if point is None:
+                    continue
+                di = (point[0] - tx1)**2 + (point[1] - ty1)**2
+                dj = (point[0] - xs[j])**2 + (point[1] - ys[j])**2
+                if di <= dj:
+                    frozen.append(i)  # player i closer to intersection point
+                if di >= dj:
+                    frozen.append(j)  # player j closer, or both if equidistant
+        for j in frozen:
+            self.movable[j] = 0
+
+    def live_crossing(self, j, start, stop, xt, yt, x_min, x_max, y_min, y_max):
+        """Returns the first point where the tail crosses the segments
+        of player j's trace from start to stop, whose last point is
+        tested on its own as line_intersection_detected does, or None"""
+        x_vec, y_vec, offset = self.x_live[j], self.y_live[j], self.live[j]
+        n = offset + len(x_vec)
+        for k in range(start, stop):
+            if k < n:
+                ax, ay = x_vec[k-offset], y_vec[k-offset]
+            else:
+                ax, ay = self.x[j], self.y[j]
+            if k + 1 >= stop:
+                bx, by = ax, ay
+            elif k + 1 < n:
+                bx, by = x_vec[k+1-offset], y_vec[k+1-offset]
+            else:
+                bx, by = self.x[j], self.y[j]
+            point = crossing(ax, ay, bx, by, xt, yt, x_min, x_max, y_min, y_max)
+            if point is not None:
+                return point
+
+    def rollout(self, player, first=None, depth=25, rng=None, turn_rate=0.1):
+        """Resets and plays up to depth ticks with player turning
+        first on the first tick and then at random, the others go
+        straight. Returns the number of ticks player survived."""
+        self.reset()
+        actions = [(player, first)]
+        while self.ticks < depth and self.movable[player]:
+            self.step(actions)
+            actions = ()
+            if rng and rng.random() < turn_rate:
+                actions = [(player, rng.choice(('left', 'right')))]
+        survived = self.ticks if not self.movable[player] else depth + 1
+        if self.occupancy is not None:  # leave the game's grid as it was
+            self.occupancy.restore(self.start_cells)
+        return survived
+
+
+class RandomBot(Controller):
+    """Turns at random, roughly once every 1/turn_rate ticks"""
+    # class wide variables
+    turn_rate = 0.05
+
+    # methods
+    def __init__(self, turn_rate=None, seed=None):
+        self.turn_rate = turn_rate or self.turn_rate
+        self.rng = Random(seed)
+
+    def decide(self, view):
+        if self.rng.random() < self.turn_rate:
+            return self.rng.choice(('left', 'right'))
+
+
+class LookaheadBot(Controller):
+    """Tries going straight, left and right with random
+    rollouts from each until the time budget runs out and
+    takes the move that survived longest on average. Given
+    a number of samples it plays that many rollouts instead,
+    so a seeded bot decides the same on any machine."""
+    # class wide variables
+    depth = 25      # ticks per rollout
+    budget = 0.005  # seconds per decision
+    samples = None  # rollouts per decision, None to play until the budget runs out
+
+    # methods
+    def __init__(self, depth=None, budget=None, seed=None, samples=None):
+        self.depth = depth or self.depth
+        self.budget = budget or self.budget
+        self.samples = samples or self.samples
+        self.rng = Random(seed)
+        self.rollouts = 0  # rollouts played over every decision
+
+    def decide(self, view):
+        sim = Lookahead(view.game)
+        moves = (None, 'left', 'right')
+        totals, counts = [0, 0, 0], [0, 0, 0]
+        deadline = now() + self.budget
+        k = 0
+        while (k < len(moves)) or ((k < self.samples) if self.samples else (now() < deadline)):
+            m = k % len(moves)
+            totals[m] += sim.rollout(view.player, moves[m], self.depth, self.rng)
+            counts[m] += 1
+            k += 1
+        self.rollouts += k
+        means = [t/c for t, c in zip(totals, counts)]
+        return moves[means.index(max(means))]  # ties go straight
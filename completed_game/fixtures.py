@@ -0,0 +1,14 @@
+from pytron import Player, Game
+
+
+def new_game(n_players=2, size=300, collisions=None, paused=False, height=None, controllers=()):
+    """Returns a size by size (or height) game with n_players set up,
+    the first of which are given controllers, shared by the tests of
+    every module"""
+    game = Game(width=size, height=height or size, collisions=collisions)
+    [game.add_player(Player()) for _ in range(n_players)]
+    for p, controller in zip(game.player_list, controllers):
+        p.controller = controller
+    game.setup_players()
+    game.paused = paused
+    return game
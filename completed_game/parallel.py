@@ -0,0 +1,230 @@
+# ================================================= #
+# Author: Samuel Law                                #
+# Title: Line Crossing Game - parallel checks       #
+#                                                   #
+# Description:                                      #
+# Splits the line checks of big games over worker   #
+# processes that read the traces from shared memory #
+# ================================================= #
+
+import json
+import multiprocessing
+import os
+import sys
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from random import Random
+from timeit import default_timer as now
+from pytron import Game, Player, TraceView, TickStats
+
+
+# ================== settings ==================
+ITEM = 4             # bytes per vertex coordinate, same as Player.x_vec
+MIN_CAPACITY = 1024  # vertices per shared buffer at first
+
+
+# ================== classes ==================
+class CollisionPool():
+    """Runs the tail checks of Game.check_for_line_intersections on
+    worker processes. Each player's vertices are copied once into a
+    shared memory buffer as they are added, the workers read them in
+    place and keep their own segment grid, so a tick only sends the
+    heads and swept tails. The tails are dealt out round robin, this
+    process checks a share too while it waits. The freezes found are
+    merged into one sorted set, the same whichever worker found them,
+    and the segments the workers tested are added to the game's stats."""
+
+    # methods
+    def __init__(self, workers=None, context=None):
+        ctx = multiprocessing.get_context(context)
+        if os.name == 'posix':  # workers share this process' tracker of shared memory
+            resource_tracker.ensure_running()
+        self.workers = max(os.cpu_count() - 1, 1) if workers is None else workers
+        self.connections, self.processes = [], []
+        for _ in range(self.workers):
+            connection, child = ctx.Pipe()
+            process = ctx.Process(target=collision_worker, args=(child,), daemon=True)
+            process.start()
+            child.close()
+            self.connections.append(connection)
+            self.processes.append(process)
+        self.game = None
+        self.rounds = 0    # number of games served, the workers start afresh on a new one
+        self.buffers = []  # holds [SharedMemory, capacity, vertices published, Lineage branch] per player
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def start(self, game):
+        """Serves game from now on, its traces are copied
+        to new buffers on the next check"""
+        self.release()
+        self.game = game
+        self.rounds += 1
+
+    def publish(self, owner, p):
+        """Copies the vertices player p added since the last
+        check to its buffer. Returns the number of vertices that
+        are unchanged if the trace was cut back, None if not."""
+        if owner == len(self.buffers):
+            self.buffers.append([None, 0, 0, p.lineage.current])
+        entry = self.buffers[owner]
+        shm, capacity, published, branch = entry
+        n, cut = len(p.x_vec), None
+        if branch != p.lineage.current:  # cut back since, keep what is intact
+            cut = min(published, n)
+            if not p.lineage.intact(branch, cut):
+                cut = 0
+            published, entry[3] = cut, p.lineage.current
+        if n > capacity:  # grow, the workers attach to the new buffer by name
+            capacity = max(2*n, MIN_CAPACITY)
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+            shm = SharedMemory(create=True, size=2*ITEM*capacity)
+            entry[0], entry[1], published = shm, capacity, 0
+        if n > published:
+            view = shm.buf.cast('i')
+            view[published:n] = p.x_vec[published:n]
+            view[capacity+published:capacity+n] = p.y_vec[published:n]
+            view.release()
+        entry[2] = n
+        return cut
+
+    def check(self, game, traces, tails):
+        """Returns the players the tails freeze, sorted"""
+        players = []
+        for owner, (p, (x_vec, y_vec)) in enumerate(zip(game.player_list, traces)):
+            cut = self.publish(owner, p)
+            shm, capacity, n, _ = self.buffers[owner]
+            players.append((shm.name, capacity, n, x_vec.head, y_vec.head, cut))
+        # deal the tails out, the last share is checked here
+        moving = [i for i, tail in enumerate(tails) if tail[0]]
+        shares = [{i: tails[i] for i in moving[k::self.workers + 1]} for k in range(self.workers + 1)]
+        counting = game.stats is not None
+        for connection, share in zip(self.connections, shares):
+            connection.send((self.rounds, counting, players, share))
+        live_boxes = [game.live_box(i, *trace) for i, trace in enumerate(traces)]
+        frozen = {j for i, tail in shares[-1].items() for j in game.tail_freezes(i, traces, tail, live_boxes)}
+        for connection in self.connections:
+            found, segments = connection.recv()
+            frozen.update(found)
+            if counting:
+                game.stats.segments += segments
+        return sorted(frozen)
+
+    def release(self):
+        """Frees the shared buffers"""
+        for shm, *_ in self.buffers:
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+        self.buffers = []
+
+    def close(self):
+        """Stops the workers and frees the shared buffers,
+        the game goes back to checking on this process"""
+        for connection in self.connections:
+            connection.send(None)
+        for process in self.processes:
+            process.join()
+        for connection in self.connections:
+            connection.close()
+        self.connections, self.processes = [], []
+        self.release()
+        if self.game is not None and self.game.pool is self:
+            self.game.pool = None
+
+
+# ================== workers ==================
+def collision_worker(connection):
+    """Answers (counting, players, tails) messages from a CollisionPool
+    with the players the tails freeze and the number of segments tested
+    if counting, until it is sent None"""
+    game, rounds = None, None  # only the game's checks are used, with this worker's segment grid
+    buffers = {}               # holds name -> SharedMemory
+    while (message := connection.recv()) is not None:
+        if message[0] != rounds:  # a new game
+            game, rounds = Game(), message[0]
+        game.stats = TickStats() if message[1] else None
+        frozen = check_tails(game, buffers, *message[2:])
+        connection.send((frozen, game.stats.segments if message[1] else 0))
+    for shm in buffers.values():
+        shm.close()
+    connection.close()
+
+
+def check_tails(game, buffers, players, tails):
+    """Views each player's shared buffer as a trace and
+    returns the players that the tails in tails freeze"""
+    names = {name for name, *_ in players}
+    for name in [name for name in buffers if name not in names]:
+        buffers.pop(name).close()  # the player's buffer grew
+    traces = []
+    for owner, (name, capacity, n, x_head, y_head, cut) in enumerate(players):
+        if name not in buffers:
+            buffers[name] = SharedMemory(name=name)
+        view = buffers[name].buf.cast('i')
+        traces.append((TraceView(view[:n], x_head), TraceView(view[capacity:capacity+n], y_head)))
+        if cut is not None:
+            game.segment_grid.truncate(owner, max(cut - 2, 0))
+        game.segment_grid.sync(owner, *traces[owner])
+    live_boxes = [game.live_box(i, *trace) for i, trace in enumerate(traces)]
+    return [j for i, tail in tails.items() for j in game.tail_freezes(i, traces, tail, live_boxes)]
+
+
+# ================== speedup test ==================
+def lane_game(n_players, collisions=None):
+    """Returns a started game on a playfield wide enough
+    to give each player their own lane, also used by the
+    benchmarks of big games"""
+    game = Game(width=20*n_players + 200, height=2_000, collisions=collisions)
+    for _ in range(n_players):
+        game.add_player(Player())
+    game.setup_players()
+    game.paused = False
+    return game
+
+
+def lane_presses(n_players, seed):
+    """Returns the key presses a lane_game gets on each tick"""
+    rng = Random(seed)
+    return [[(i, rng.choice(('left', 'right'))) for i in range(n_players) if rng.random() < 0.02]
+            for _ in range(10_000)]
+
+
+def play(game, presses, ticks):
+    """Plays ticks ticks, returns the seconds taken"""
+    start = now()
+    for tick in range(ticks):
+        for player, action in presses[tick]:
+            game.handle_input(player, action)
+        game.tick()
+    return now() - start
+
+
+def speedup_test(player_counts=(8, 16, 32, 64, 128), ticks=200, workers=None, seed=0):
+    """Plays the same rounds with and without a CollisionPool and
+    returns one record per player count of the seconds per tick and
+    the speedup, the freezes must come out the same both ways"""
+    results = []
+    with CollisionPool(workers) as pool:
+        for n_players in player_counts:
+            serial, parallel = lane_game(n_players), lane_game(n_players)
+            presses = lane_presses(n_players, seed)
+            parallel.attach_pool(pool)
+            serial_s, parallel_s = play(serial, presses, ticks), play(parallel, presses, ticks)
+            if [p.movable for p in serial.player_list] != [p.movable for p in parallel.player_list]:
+                raise AssertionError(f"the pool froze other players with {n_players} players")
+            results.append({'players': n_players, 'workers': pool.workers, 'ticks': ticks,
+                            'serial_tick_s': serial_s/ticks, 'parallel_tick_s': parallel_s/ticks,
+                            'speedup': serial_s/parallel_s})
+    return results
+
+
+if __name__ == "__main__":
+    for record in speedup_test():
+        sys.stdout.write(json.dumps(record) + '\n')
@@ -7,72 +7,228 @@
 # alive by not allowing a line intersection         #
 # ================================================= #
 
-import turtle
+import sys
+from array import array
+from bisect import bisect_right
+from collections import deque, namedtuple
+from collections.abc import Sequence
+from time import sleep
 from timeit import default_timer as now
-from tkinter import TclError
+from functools import partial
 from math import floor, dist
+from recorder import Recorder, Recording
+# turtle & tkinter are imported by TurtleRenderer and play_pytron
+# when something is drawn, so the simulation needs no Tk, and numpy
+# by line_intersection_detected_np, as it is most of an import
 
 
 # ================== classes ==================
+class TraceView(Sequence):
+    """Read only view of a trace vector with the live head
+    point appended, shares the player's buffer so building
+    one copies nothing. Slices are returned as new lists."""
+    __slots__ = ('vertices', 'head')
+
+    # methods
+    def __init__(self, vertices, head=None):
+        self.vertices = vertices  # committed vertices, not to be modified
+        self.head = head          # current position or None if on a vertex
+
+    def __len__(self):
+        return len(self.vertices) + (self.head is not None)
+
+    def __getitem__(self, index):
+        vertices, head = self.vertices, self.head
+        n = len(vertices)
+        if index.__class__ is slice:
+            start, stop, step = index.indices(n + (head is not None))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            items = vertices[start:stop].tolist()
+            if (head is not None) and (start <= n < stop):
+                items.append(head)
+            return items
+        if index < 0:
+            index += n + (head is not None)
+        if index == n and head is not None:
+            return head
+        if not 0 <= index < n:
+            raise IndexError('trace index out of range')
+        return vertices[index]
+
+    def __iter__(self):
+        yield from self.vertices
+        if self.head is not None:
+            yield self.head
+
+    def __eq__(self, other):
+        if isinstance(other, (Sequence, array)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return f"TraceView({list(self)})"
+
+
+class Lineage():
+    """Keeps track of which earlier lengths of an append only buffer
+    are still intact as it is cut back and grown again, so snapshots
+    can hold a length instead of a copy. Snapshots hold the number of
+    cuts made so far as their branch, and a length is intact if no
+    cut since went below it. Only the cuts that are shorter than
+    every later one can decide that, so the others are dropped and
+    the cuts held never outnumber the items of the buffer."""
+    __slots__ = ('branches', 'lengths', 'current')
+
+    # methods
+    def __init__(self):
+        self.branches = array('l')  # holds the number of cuts made up to each cut held
+        self.lengths = array('l')   # holds the length of each cut held, increasing
+        self.current = 0
+
+    def cut(self, length):
+        """Records that the buffer was cut back to length"""
+        self.current += 1
+        while self.lengths and (self.lengths[-1] >= length):
+            self.branches.pop()  # every snapshot before it is decided by this cut
+            self.lengths.pop()
+        self.branches.append(self.current)
+        self.lengths.append(length)
+
+    def intact(self, branch, length):
+        """Returns true if the first length items of the buffer
+        are the same as they were on branch"""
+        k = bisect_right(self.branches, branch)  # the shortest cut since
+        return (k == len(self.lengths)) or (self.lengths[k] >= length)
+
+
+class SpeedSchedule():
+    """Speed curve, maps a score to a multiplier of the base distance.
+    The score is split into levels of step points, level k moves at
+    1 + k*increment times the base distance unless a list of
+    multipliers is given, the last of which then holds for good.
+    Players keep the score range of their level and only look the
+    speed up again once their score leaves it."""
+    # class wide variables
+    step = 1000.0   # points per level
+    increment = 0.5  # multiplier gained per level
+
+    # methods
+    def __init__(self, step=None, increment=None, multipliers=None):
+        self.step = step or self.step
+        self.increment = self.increment if increment is None else increment
+        self.multipliers = tuple(multipliers) if multipliers else None
+
+    def level(self, score):
+        return floor(score/self.step)
+
+    def multiplier(self, level):
+        if self.multipliers is None:
+            return (level*self.increment) + 1
+        return self.multipliers[min(level, len(self.multipliers) - 1)]
+
+    def span(self, level):
+        """Returns the (lowest, next level's) score of level"""
+        return level*self.step, (level + 1)*self.step
+
+
+PlayerState = namedtuple('PlayerState', ['x', 'y', 'heading', 'score', 'movable',
+                                         'distance_per_loop', 'vertices', 'branch'])
+PlayerState.__doc__ = """Snapshot of a Player, x & y are in units and the trace
+is held as the number of vertices and the Lineage branch they were on"""
+
+
 class Player():
-    """Class that handles player state and turtle object"""
+    """Class that handles player state, drawing the
+    player is left to a renderer such as TurtleRenderer.
+    Positions and traces are whole numbers of units, a
+    hundredth of a pixel, so the base distance and every
+    speed of the default schedule are exact and traces
+    compare exactly on any platform."""
     # class wide variables
-    base_distance = 2.0
+    base_distance = 2.0  # pixels moved per tick at the start
+    units = 100          # units per pixel
+    directions = {0: (1, 0), 90: (0, 1), 180: (-1, 0), 270: (0, -1)}
+    speed_schedule = SpeedSchedule()
 
     # methods
-    def __init__(self, canvas=None, key_bindings={}):
+    def __init__(self, key_bindings={}, controller=None, speed_schedule=None):
+        self.speed_schedule = speed_schedule or self.speed_schedule
         self.score = 0
+        self.speed_from, self.speed_until, self.speed = 0.0, 0.0, 0.0  # score range of the speed
+        self.speed_units = 0       # units moved per tick at speed
         self.movable = 1
-        self.x_vec, self.y_vec = [], []
+        self.x_vec, self.y_vec = array('i'), array('i')  # 4 bytes per vertex, in units
+        self.lineage = Lineage()   # tracks cuts of the trace for snapshots
+        self.x, self.y = 0, 0      # current position in units
+        self.heading = 0           # degrees, 0 points east
         self.distance_per_loop = self.base_distance
-        self.cursor = turtle.RawTurtle(canvas=canvas) if canvas else turtle.Turtle()
-        self.cursor.degrees()  # set the turtle module to degrees
         self.left_btn = key_bindings.get('left_btn', None)
         self.right_btn = key_bindings.get('right_btn', None)
+        self.controller = controller  # Controller that turns the player, None for keys only
 
     def get_pos(self):
-        """Returns the position in a way
-        that will not cause errors in the line
-        detection algorithm as 5.499999 will
-        be rounded to 5.50 """
-        x, y = self.cursor.pos()
-        return (round(x, 2), round(y, 2))
+        """Returns the position in pixels"""
+        return (self.x/self.units, self.y/self.units)
 
     def update_trace(self):
         """Add the point to the trace"""
-        x, y = self.get_pos()
-        self.x_vec.append(x)
-        self.y_vec.append(y)
+        self.x_vec.append(self.x)
+        self.y_vec.append(self.y)
 
     def get_trace(self):
         """Returns two vectors that represent the
         the "traced" image resulting from the players
-        moves, does include the current position """
-        x, y = self.get_pos()
+        moves, does include the current position.
+        The vectors are TraceViews of the player's
+        buffers in units so nothing is copied."""
+        x, y = self.x, self.y
         if (x == self.x_vec[-1]) and (y == self.y_vec[-1]):
-            return self.x_vec, self.y_vec
+            return TraceView(self.x_vec), TraceView(self.y_vec)
         else:
-            return [*self.x_vec, x], [*self.y_vec, y]
+            return TraceView(self.x_vec, x), TraceView(self.y_vec, y)
 
     def reset_trace(self):
         """Clears the trace, used for starting new games"""
-        self.x_vec.clear()
-        self.y_vec.clear()
+        del self.x_vec[:]
+        del self.y_vec[:]
+        self.lineage.cut(0)
+
+    def snapshot(self):
+        """Returns a PlayerState, the trace isn't copied"""
+        return PlayerState(self.x, self.y, self.heading, self.score, self.movable,
+                           self.distance_per_loop, len(self.x_vec), self.lineage.current)
+
+    def restore(self, state):
+        """Goes back to a PlayerState by cutting the trace back
+        to its length, raises ValueError if the vertices it held
+        have since been cut away"""
+        if not self.lineage.intact(state.branch, state.vertices):
+            raise ValueError("the snapshot's trace has been cut away")
+        if len(self.x_vec) > state.vertices:
+            del self.x_vec[state.vertices:]
+            del self.y_vec[state.vertices:]
+            self.lineage.cut(state.vertices)
+        (self.x, self.y, self.heading, self.score, self.movable,
+         self.distance_per_loop) = state[:6]
 
     def turn_right(self):
         """Updates the trace and turns right"""
-        self.cursor.right(90)
+        self.heading = (self.heading - 90) % 360
         self.update_trace()
 
     def turn_left(self):
         """Updates the trace and turns left"""
-        self.cursor.left(90)
+        self.heading = (self.heading + 90) % 360
         self.update_trace()
 
     def move(self):
         """Moves the player in the current direction
         at the desired speed"""
-        self.cursor.forward(self.distance_per_loop)
+        dx, dy = self.directions[self.heading]
+        distance = round(self.distance_per_loop*self.units)
+        self.x += dx*distance
+        self.y += dy*distance
 
     def freeze(self):
         self.movable = 0
@@ -82,34 +238,535 @@ class Player():
         self.score += self.distance_per_loop
 
     def update_dist_per_loop(self):
-        """Increments the distance per loop"""
-        self.distance_per_loop = self.movable*self.base_distance \
-                                 *((floor(self.score/1000)*0.5) + 1)
+        """Sets the distance per loop from the speed schedule,
+        which is only looked at when the score has left the
+        range of the current speed"""
+        if not (self.speed_from <= self.score < self.speed_until):
+            self.set_speed()
+        self.distance_per_loop = self.speed if self.movable else 0.0
+
+    def set_speed(self):
+        """Looks up the speed of the score and its range"""
+        schedule = self.speed_schedule
+        level = schedule.level(self.score)
+        self.speed_from, self.speed_until = schedule.span(level)
+        self.speed = self.base_distance*schedule.multiplier(level)
+        self.speed_units = round(self.speed*self.units)
+
+    def update(self):
+        """One tick of update_score, update_dist_per_loop & move"""
+        score = self.score = self.score + self.distance_per_loop
+        if not (self.speed_from <= score < self.speed_until):
+            self.set_speed()
+        if self.movable:
+            self.distance_per_loop, distance = self.speed, self.speed_units
+        else:
+            self.distance_per_loop, distance = 0.0, 0
+        dx, dy = self.directions[self.heading]
+        self.x += dx*distance
+        self.y += dy*distance
 
     def set_starting_pos(self, x=0, y=0):
-        """Moves the player to the desired starting position
-        with out drawing a line"""
-        self.cursor.penup()       # don't draw
-        self.cursor.setpos(x, y)  # go to point x, y
-        self.cursor.pendown()     # get ready to draw
-        self.update_trace()       # add x, y to the vectors
+        """Moves the player to the desired starting position,
+        given in pixels, with out drawing a line"""
+        self.x, self.y = round(x*self.units), round(y*self.units)  # go to point x, y
+        self.update_trace()                                          # add x, y to the vectors
+
+
+class Controller():
+    """Base class of bots. Before every tick decide is called
+    for each movable player the controller was given to, it
+    gets a GameView and returns 'left', 'right' or None."""
+
+    # methods
+    def decide(self, view):
+        return None
+
+
+class GameView():
+    """Read only view of a game handed to controllers, the
+    traces are TraceViews of the players' buffers so building
+    one copies nothing"""
+    __slots__ = ('game', 'player')
+
+    # methods
+    def __init__(self, game, player):
+        self.game = game      # not to be modified
+        self.player = player  # index of the player deciding
+
+    @property
+    def tick(self):
+        return self.game.tick_count
+
+    @property
+    def bounds(self):
+        """Returns the half width & height of the playfield"""
+        return self.game.half_width, self.game.half_height
+
+    def heads(self):
+        """Returns (x, y, heading, movable) of every player"""
+        return [(*p.get_pos(), p.heading, p.movable) for p in self.game.player_list]
+
+    def traces(self):
+        """Returns (x_vec, y_vec) of every player in units"""
+        return [p.get_trace() for p in self.game.player_list]
+
+
+class SegmentGrid():
+    """Uniform grid that buckets closed trace segments by
+    the cells their bounding boxes cover, so a tail only
+    has to be tested against the segments near it"""
+    # class wide variables
+    cell_size = 32*Player.units
+
+    # methods
+    def __init__(self, cell_size=None):
+        self.cell_size = cell_size or self.cell_size
+        self.cells = {}   # holds (cx, cy) -> [(owner, index), ...]
+        self.counts = {}  # holds owner -> number of segments indexed
+        self.boxes = {}   # holds owner -> [cells covered by each segment, ...]
+
+    def cell_range(self, x_vec, y_vec):
+        """Returns the cells covered by the bounding
+        box of the points in x_vec & y_vec"""
+        c = self.cell_size
+        x0, x1 = floor(min(x_vec)/c), floor(max(x_vec)/c)
+        y0, y1 = floor(min(y_vec)/c), floor(max(y_vec)/c)
+        return [(cx, cy) for cx in range(x0, x1+1) for cy in range(y0, y1+1)]
+
+    def add_segment(self, owner, index, x_vec, y_vec):
+        """Adds segment number index of owner's trace to
+        every cell its bounding box covers"""
+        cells = self.cell_range(x_vec, y_vec)
+        for cell in cells:
+            self.cells.setdefault(cell, []).append((owner, index))
+        self.boxes.setdefault(owner, []).append(cells)
+
+    def remove_owner(self, owner):
+        """Drops every segment belonging to owner,
+        used when a trace is reset"""
+        self.truncate(owner, 0)
+        self.counts.pop(owner, None)
+        self.boxes.pop(owner, None)
+
+    def clear(self):
+        """Drops every segment"""
+        self.cells.clear()
+        self.counts.clear()
+        self.boxes.clear()
+
+    def sync(self, owner, x_vec, y_vec):
+        """Indexes any newly closed segments of a trace. The
+        last segment of a trace is still growing so it is
+        never indexed, every other segment is added once."""
+        closed = max(len(x_vec) - 2, 0)
+        start = self.counts.get(owner, 0)
+        if closed < start:  # the trace was reset
+            self.remove_owner(owner)
+            start = 0
+        for i in range(start, closed):
+            self.add_segment(owner, i, x_vec[i:i+2], y_vec[i:i+2])
+        self.counts[owner] = closed
+
+    def truncate(self, owner, count):
+        """Forgets owner's segments from number count on after
+        their trace was cut back, only the cells they covered are
+        visited. sync adds the segments again as the trace grows back."""
+        boxes = self.boxes.get(owner, [])
+        if len(boxes) <= count:
+            return
+        touched = {cell for cells in boxes[count:] for cell in cells}
+        for cell in touched:
+            entries = [e for e in self.cells[cell] if (e[0] != owner) or (e[1] < count)]
+            if entries:
+                self.cells[cell] = entries
+            else:
+                del self.cells[cell]
+        del boxes[count:]
+        self.counts[owner] = count
+
+    def query(self, x_vec, y_vec):
+        """Returns a dict of owner -> sorted segment indices
+        for every indexed segment whose cells overlap the
+        bounding box of x_vec & y_vec"""
+        found = {}
+        for cell in self.cell_range(x_vec, y_vec):
+            for owner, index in self.cells.get(cell, ()):
+                found.setdefault(owner, set()).add(index)
+        return {owner: sorted(indices) for owner, indices in found.items()}
+
+
+class RunArray():
+    """Append only array of ints held as runs that go up by a
+    constant step, so the cells marked along a straight line take
+    one run however long the line is. ends holds the number of
+    items up to the end of each run."""
+    __slots__ = ('starts', 'steps', 'ends')
+
+    # methods
+    def __init__(self):
+        self.starts, self.steps, self.ends = array('l'), array('l'), array('l')
+
+    def __len__(self):
+        return self.ends[-1] if self.ends else 0
+
+    def append(self, value):
+        starts, steps, ends = self.starts, self.steps, self.ends
+        if ends:
+            n = ends[-1] - (ends[-2] if len(ends) > 1 else 0)  # items in the last run
+            if n == 1:  # the second item sets the step
+                steps[-1] = value - starts[-1]
+                ends[-1] += 1
+                return
+            if value == starts[-1] + n*steps[-1]:
+                ends[-1] += 1
+                return
+        starts.append(value)
+        steps.append(0)
+        ends.append(len(self) + 1)
+
+    def items(self, start=0):
+        """Yields the items from position start on"""
+        r = bisect_right(self.ends, start)
+        for r in range(r, len(self.ends)):
+            begin = self.ends[r-1] if r else 0
+            value, step = self.starts[r], self.steps[r]
+            for j in range(max(start - begin, 0), self.ends[r] - begin):
+                yield value + j*step
+
+    def truncate(self, length):
+        """Drops the items from position length on"""
+        r = bisect_right(self.ends, length)  # first run that goes past length
+        if r < len(self.ends):
+            begin = self.ends[r-1] if r else 0
+            keep = r + (length > begin)
+            del self.starts[keep:], self.steps[keep:], self.ends[keep:]
+            if length > begin:
+                self.ends[-1] = length
+
+
+class OccupancyGrid():
+    """Raster of the playfield, each cell holds the number of the
+    player (starting at 1) whose trail covers it or 0 if free. Cells
+    are half the base distance so every speed moves a head a whole
+    number of cells, and a head only sweeps those few cells a tick."""
+
+    # methods
+    def __init__(self, width, height, cell_size):
+        self.cell_size = cell_size
+        self.nx = int(width/cell_size) + 4   # columns, with a margin past the borders
+        self.ny = int(height/cell_size) + 4  # rows
+        self.owners = array('H', bytes(2*self.nx*self.ny))
+        self.heads = {}   # holds owner -> cell the head was last in
+        self.counts = {}  # holds owner -> number of trace vertices seen
+        self.journals = {}  # holds owner -> RunArray of the positions of their cells, in order
+        self.lineages = {}  # holds owner -> Lineage tracking cuts of their journal for snapshots
+
+    def cell(self, x, y):
+        """Returns the cell x, y is in"""
+        c = self.cell_size
+        return floor(x/c), floor(y/c)
+
+    def center(self, cell):
+        c = self.cell_size
+        return (cell[0] + 0.5)*c, (cell[1] + 0.5)*c
+
+    def index(self, cell):
+        """Returns the position of cell in owners, None if it
+        is off the grid"""
+        cx, cy = cell[0] + self.nx//2, cell[1] + self.ny//2
+        if (0 <= cx < self.nx) and (0 <= cy < self.ny):
+            return cx + cy*self.nx
+
+    def owner(self, cell):
+        """Returns the player covering cell, None if it is free"""
+        k = self.index(cell)
+        if (k is not None) and self.owners[k]:
+            return self.owners[k] - 1
+
+    def mark(self, owner, cell):
+        """Gives a free cell to owner"""
+        k = self.index(cell)
+        if (k is not None) and not self.owners[k]:
+            self.owners[k] = owner + 1
+            if owner not in self.journals:
+                self.journals[owner], self.lineages[owner] = RunArray(), Lineage()
+            self.journals[owner].append(k)
+
+    def path(self, start, end):
+        """Returns the cells from start (not included) to end
+        (included), along x and then along y"""
+        (x0, y0), (x1, y1) = start, end
+        sx, sy = (1 if x1 > x0 else -1), (1 if y1 > y0 else -1)
+        cells = [(cx, y0) for cx in range(x0 + sx, x1 + sx, sx)] if x0 != x1 else []
+        cells += [(x1, cy) for cy in range(y0 + sy, y1 + sy, sy)] if y0 != y1 else []
+        return cells
+
+    def rasterize(self, owner, x_vec, y_vec):
+        """Marks every cell of a trace as owner's"""
+        cell = self.cell(x_vec[0], y_vec[0])
+        self.mark(owner, cell)
+        for x, y in zip(x_vec[1:], y_vec[1:]):
+            end = self.cell(x, y)
+            [self.mark(owner, c) for c in self.path(cell, end)]
+            cell = end
+        return cell
+
+    def sweep(self, owner, x_vec, y_vec):
+        """Returns the cells owner's head moved into since the last
+        sweep. The first time an owner is seen, or after their trace
+        was reset, the whole trace is marked instead."""
+        n = len(x_vec)
+        if (owner not in self.heads) or (n < self.counts[owner]):
+            if owner in self.heads:  # the trace was reset
+                self.free(owner, 0)  # earlier snapshots can't be restored
+            self.heads[owner] = self.rasterize(owner, x_vec, y_vec)
+            self.counts[owner] = n
+            return []
+        self.counts[owner] = n
+        end = self.cell(x_vec[-1], y_vec[-1])
+        cells = self.path(self.heads[owner], end)
+        self.heads[owner] = end
+        return cells
+
+    def free(self, owner, marked):
+        """Frees owner's cells from the marked'th on"""
+        journal = self.journals[owner]
+        if len(journal) > marked:
+            for k in journal.items(marked):
+                self.owners[k] = 0
+            journal.truncate(marked)
+            self.lineages[owner].cut(marked)
+
+    def snapshot(self):
+        """Returns the journal lengths & branches and the heads"""
+        return ({owner: (len(journal), self.lineages[owner].current) for owner, journal in self.journals.items()},
+                dict(self.heads), dict(self.counts))
+
+    def restorable(self, state):
+        """Returns true if the cells marked since snapshot
+        returned state can still be freed"""
+        return all(self.lineages[owner].intact(branch, marked) for owner, (marked, branch) in state[0].items())
+
+    def restore(self, state):
+        """Frees the cells marked since snapshot returned state"""
+        journals, heads, counts = state
+        for owner in self.journals:
+            self.free(owner, journals.get(owner, (0, None))[0])
+        self.heads, self.counts = dict(heads), dict(counts)
+
+
+class FrameScheduler():
+    """Fixed timestep scheduler. Elapsed time is accumulated and
+    spent in whole ticks, so the simulation stays deterministic
+    when rendering falls behind, and the time left until the
+    next deadline is slept away instead of spun on."""
+    # class wide variables
+    tick_rate = 25.0   # simulation ticks per second
+    render_rate = 25.0  # frames drawn per second
+    max_catch_up = 5   # most ticks run per wake up
+
+    # methods
+    def __init__(self, tick_rate=None, render_rate=None):
+        self.tick_rate = tick_rate or self.tick_rate
+        self.render_rate = render_rate or self.render_rate
+        self.tick_dt = 1/self.tick_rate
+        self.render_dt = 1/self.render_rate
+        self.start(now())
+
+    def start(self, t):
+        """Resets the clock to time t"""
+        self.last = t         # time of the last advance
+        self.lag = 0.0        # simulation time owed
+        self.next_render = t  # deadline of the next frame
+
+    def advance(self, t, paused=False):
+        """Returns the number of ticks due at time t,
+        no time is owed while paused"""
+        if not paused:
+            self.lag += t - self.last
+        self.last = t
+        ticks = int((self.lag + 1e-9) // self.tick_dt)  # tolerate float error at the deadline
+        if ticks > self.max_catch_up:  # drop a backlog that can't be caught up
+            ticks, self.lag = self.max_catch_up, 0.0
+        else:
+            self.lag = max(self.lag - ticks*self.tick_dt, 0.0)
+        return ticks
+
+    def render_due(self, t):
+        """Returns true if a frame should be drawn at time t"""
+        if t < self.next_render:
+            return False
+        self.next_render += self.render_dt
+        if self.next_render <= t:  # fell behind, don't try to catch up
+            self.next_render = t + self.render_dt
+        return True
+
+    def sleep_time(self, t, paused=False):
+        """Returns the time from t until the next deadline,
+        only frames are scheduled while paused"""
+        deadline = self.next_render
+        if not paused:
+            deadline = min(deadline, t + self.tick_dt - self.lag)
+        return max(deadline - t, 0.0)
+
+
+class TickStats():
+    """Opt in instrumentation for Game.tick and Game.run_loop. Keeps
+    the time spent in each phase of the last tick, totals, overruns of
+    the tick budget and the number of segments tested, plus a rolling
+    window of recent ticks that is dumped as histograms at game end."""
+    # class wide variables
+    window = 500  # ticks kept for the histograms
+    bins = [0.0001, 0.0002, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.04]  # bin edges in seconds
+
+    # methods
+    def __init__(self, budget=None, window=None, path=None):
+        self.budget = budget                 # seconds a tick may take, None to take it from run_loop
+        self.window = window or self.window
+        self.path = path                     # file to dump to, None for stderr
+        self.ticks = 0                       # ticks recorded
+        self.overruns = 0                    # ticks that went over budget
+        self.segments = 0                    # segments tested during the current tick
+        self.last = {}                       # holds phase -> seconds in the last tick
+        self.totals = {}                     # holds phase -> total seconds
+        self.history = {}                    # holds phase -> recent seconds
+        self.segment_history = deque(maxlen=self.window)
+
+    def record(self, phase, seconds):
+        """Adds the time spent in one phase"""
+        self.last[phase] = seconds
+        self.totals[phase] = self.totals.get(phase, 0.0) + seconds
+        if phase not in self.history:
+            self.history[phase] = deque(maxlen=self.window)
+        self.history[phase].append(seconds)
+
+    def timed_tick(self, phases, segments=True):
+        """Runs the (name, function) phases of a tick and records
+        how long each took, and the segments tested unless segments
+        is false as the game's checks test none"""
+        self.segments = 0
+        total = 0.0
+        for name, phase in phases:
+            start = now()
+            phase()
+            seconds = now() - start
+            self.record(name, seconds)
+            total += seconds
+        self.record('tick', total)
+        if segments:
+            self.segment_history.append(self.segments)
+        self.ticks += 1
+        if (self.budget is not None) and (total > self.budget):
+            self.overruns += 1
+
+    def histogram(self, phase):
+        """Returns the counts of recent times of phase in
+        each bin, the last count is for times above all bins"""
+        counts = [0 for _ in range(len(self.bins) + 1)]
+        for seconds in self.history.get(phase, ()):
+            counts[sum(seconds > edge for edge in self.bins)] += 1
+        return counts
+
+    def report(self):
+        """Returns the histograms of the recent ticks as text"""
+        edges = ''.join(f"{'<' + format(edge*1000, 'g') + 'ms':>8}" for edge in self.bins)
+        lines = [f"ticks: {self.ticks}  overruns: {self.overruns}  budget: {self.budget}",
+                 f"{'phase':<8}{'mean ms':>9}{'max ms':>9}{edges}{'more':>8}"]
+        for phase, history in self.history.items():
+            mean_ms, max_ms = 1000*sum(history)/len(history), 1000*max(history)
+            counts = ''.join(f"{c:>8}" for c in self.histogram(phase))
+            lines.append(f"{phase:<8}{mean_ms:>9.3f}{max_ms:>9.3f}{counts}")
+        if self.segment_history:
+            segments = self.segment_history
+            lines.append(f"segments tested per tick: mean {sum(segments)/len(segments):.1f} max {max(segments)}")
+        return '\n'.join(lines)
+
+    def dump(self):
+        """Writes the report to path, or stderr if no path was given"""
+        if self.path:
+            with open(self.path, 'w') as f:
+                f.write(self.report() + '\n')
+        elif sys.stderr:  # pythonw has no stderr
+            sys.stderr.write(self.report() + '\n')
+
+
+GameState = namedtuple('GameState', ['tick_count', 'paused', 'players', 'inputs', 'branch',
+                                     'segment_counts', 'tail_state', 'occupancy'])
+GameState.__doc__ = """Snapshot of a Game, players holds a PlayerState each and
+the input log is held as its length and Lineage branch. occupancy holds
+the OccupancyGrid and its snapshot, None for the segment checks."""
 
 
 class Game():
-    """Class that handles game state and the
-    turtle packages Screen object"""
+    """Class that handles game state, runs headless
+    unless a renderer is attached"""
+    # class wide variables
+    width, height = 800, 600  # playfield size when headless
+    incremental_collisions = True  # only check the distance moved since the last tick
+    input_poll = 0.002             # seconds between handling key presses while run_loop waits
+    collisions = 'segments'        # 'segments' for exact checks, 'occupancy' for an OccupancyGrid
 
     # methods
-    def __init__(self, canvas=None):
+    def __init__(self, width=None, height=None, stats=None, collisions=None):
         # Game stuff
         self.player_list = []        # holds the player list
         self.paused = True           # paused flag
         self.game_over_limit = None  # allows single and muli player modes
         self.play_again = None       # flag that enables the y/n selection at end of round
+        self.segment_grid = SegmentGrid()  # spatial index of closed trace segments
+        self.tick_count = 0                # number of ticks played
+        self.bounds_fixed = False          # set by setup_players, resizes no longer change the bounds
+        self.tail_state = {}               # holds owner -> tail at the last check
+        self.stats = stats                 # TickStats, None for no instrumentation
+        self.recorder = None               # Recorder, None for no recording
+        self.pool = None                   # CollisionPool, None to check on this process
+        self.collisions = collisions or self.collisions
+        if self.collisions not in ('segments', 'occupancy'):
+            raise ValueError(f"unknown collision backend {self.collisions!r}")
+        self.occupancy = None              # OccupancyGrid when collisions is 'occupancy'
+        self.phases = (('move', self.update_players),   # steps of a tick in order
+                       ('border', self.check_for_border_collisions),
+                       ('lines', self.check_for_line_intersections))
+        self.set_bounds(width or self.width, height or self.height)
         # Gui stuff
-        self.screen = turtle.TurtleScreen(cv=canvas) if canvas else turtle.Screen()
-        self.screen.tracer(False)
-        self.screen.onkey(self.toggle_pause, 'space')
+        self.renderer = None   # draws the game, None when headless
+        self.key_bindings = {}  # holds key -> function
+        self.input_log = []     # holds (tick, player, action) for every key press
+        self.log_lineage = Lineage()  # tracks cuts of the input log for snapshots
+        self.pending = []       # holds (player, action, time pressed) until the next tick
+        self.input_sink = self.buffer_input  # where key presses are sent
+        self.onkey(partial(self.press, None, 'pause'), 'space')
+
+    def attach_renderer(self, renderer):
+        """Attaches a renderer that draws the game
+        and delivers its key presses"""
+        self.renderer = renderer
+        renderer.attach(self)
+
+    def attach_recorder(self, recorder):
+        """Starts streaming the game to a Recorder, should be
+        called after the players have been set up"""
+        self.recorder = recorder
+        recorder.start(self)
+
+    def attach_pool(self, pool):
+        """Hands the line checks to a CollisionPool's worker
+        processes, the pool can be closed once the round is over"""
+        self.pool = pool
+        pool.start(self)
+
+    def onkey(self, fun, key):
+        """Binds fun to key, the binding only has
+        an effect once a renderer is attached"""
+        self.key_bindings[key] = fun
+        if self.renderer:
+            self.renderer.onkey(fun, key)
+
+    def render(self):
+        """Draws the current state if a renderer is attached"""
+        if self.renderer:
+            self.renderer.render(self)
 
     def play_again_false(self):
         self.play_again = False
@@ -126,69 +783,329 @@ class Game():
     def toggle_pause(self):
         self.paused = not self.paused
 
+    def press(self, player, action):
+        """Called by the key bindings, sends the key press to
+        input_sink which buffers it for the next tick unless an
+        input layer such as AsyncGameLoop has replaced it"""
+        self.input_sink(player, action)
+
+    def buffer_input(self, player, action):
+        """Holds a key press until apply_pending"""
+        self.pending.append((player, action, now()))
+
+    def apply_pending(self):
+        """Applies the buffered key presses in the order they came.
+        Called at the start of every tick and by run_loop before
+        it advances, so turns always land between two moves. The
+        time from press to applied is recorded as the 'input'
+        phase of the stats."""
+        if not self.pending:
+            return
+        pending, self.pending = self.pending, []
+        t = now()
+        for player, action, pressed in pending:
+            self.handle_input(player, action)
+            if self.stats is not None:
+                self.stats.record('input', t - pressed)
+
+    def handle_input(self, player, action):
+        """Logs a key press with the number of ticks played
+        before it arrived and applies it. action is 'left' or
+        'right' for the player at index player, or 'pause'."""
+        self.input_log.append((self.tick_count, player, action))
+        self.apply_input(player, action)
+
+    def apply_input(self, player, action):
+        if action == 'pause':
+            self.toggle_pause()
+        elif action == 'left':
+            self.player_list[player].turn_left()
+        elif action == 'right':
+            self.player_list[player].turn_right()
+
+    def apply_controllers(self):
+        """Asks the controller of each movable player for a turn,
+        turns go through handle_input so they are logged like keys"""
+        for i, p in enumerate(self.player_list):
+            if (p.controller is not None) and p.movable:
+                action = p.controller.decide(GameView(self, i))
+                if action:
+                    self.handle_input(i, action)
+
+    def replay(self, input_log, until_tick=None):
+        """Plays the round again headless as fast as possible,
+        applying each logged key press after the same number of
+        ticks as when it was logged, so the traces and freezes come
+        out identical. Stops at the end of the round or once
+        until_tick ticks have been played, the game can then be
+        handed to a renderer and played on. Pauses are skipped
+        as they never change the outcome."""
+        presses = [(t, i, a) for t, i, a in input_log if (a != 'pause') and (t >= self.tick_count)]
+        presses.sort(key=lambda press: press[0])  # stable, keeps the order within a tick
+        k = 0
+        while True:
+            while (k < len(presses)) and (presses[k][0] == self.tick_count):
+                self.handle_input(*presses[k][1:])
+                k += 1
+            if self.is_over() or (self.tick_count == until_tick):
+                break
+            self.tick(controllers=False)  # their turns are in the log
+
+    def snapshot(self):
+        """Returns a GameState of everything a tick changes. Traces
+        and the input log are held as lengths, not copied, so the
+        cost only depends on the number of players."""
+        return GameState(self.tick_count, self.paused, tuple(p.snapshot() for p in self.player_list),
+                         len(self.input_log), self.log_lineage.current,
+                         dict(self.segment_grid.counts), dict(self.tail_state),
+                         self.occupancy and (self.occupancy, self.occupancy.snapshot()))
+
+    def restore(self, state):
+        """Goes back to a GameState, anything added since is cut off.
+        Raises ValueError if the state's traces or input log have been
+        cut away since, by restoring an earlier state and playing on."""
+        if len(state.players) != len(self.player_list):
+            raise ValueError("the snapshot has a different number of players")
+        if not self.log_lineage.intact(state.branch, state.inputs):
+            raise ValueError("the snapshot's input log has been cut away")
+        for p, player_state in zip(self.player_list, state.players):
+            if not p.lineage.intact(player_state.branch, player_state.vertices):
+                raise ValueError("the snapshot's trace has been cut away")
+        same_grid = (self.occupancy is not None) and state.occupancy and (state.occupancy[0] is self.occupancy)
+        if same_grid and not self.occupancy.restorable(state.occupancy[1]):
+            raise ValueError("the snapshot's occupied cells have been cut away")
+        for p, player_state in zip(self.player_list, state.players):
+            p.restore(player_state)
+        if len(self.input_log) > state.inputs:
+            del self.input_log[state.inputs:]
+            self.log_lineage.cut(state.inputs)
+        for owner in list(self.segment_grid.counts):
+            self.segment_grid.truncate(owner, state.segment_counts.get(owner, 0))
+        self.tail_state = dict(state.tail_state)
+        self.tick_count, self.paused = state.tick_count, state.paused
+        if same_grid:
+            self.occupancy.restore(state.occupancy[1])
+        elif self.occupancy is not None:  # resized since, mark the traces again
+            self.set_bounds(self.width, self.height)
+        if self.recorder is not None:
+            self.recorder.rewind(self)
+
+    def set_bounds(self, width, height):
+        """Sets the playfield size, the half sizes the
+        border checks compare against are cached in units"""
+        self.width, self.height = width, height
+        self.half_width, self.half_height = width/2, height/2
+        self.x_limit, self.y_limit = self.half_width*Player.units, self.half_height*Player.units
+        if self.collisions == 'occupancy':  # traces are marked again on the next check
+            units = Player.units
+            self.occupancy = OccupancyGrid(width*units, height*units, Player.base_distance*units/2)
+
     def boarder_collision_detected(self, x, y):
         """Returns true if the coordinates given by
         x, y are outside of the screen."""
-        if any([(abs(x) >= (self.screen.window_width()/2)),     # out of bounds width
-                (abs(y) >= (self.screen.window_height()/2))]):  # out of bounds height
+        if (abs(x) >= self.half_width) or (abs(y) >= self.half_height):
             return True
 
     def check_for_border_collisions(self):
-        """checks to see if either player is out of bounds"""
-        [p.freeze() for p in self.player_list if self.boarder_collision_detected(*p.get_pos())]
+        """checks to see if any player is out of bounds,
+        every head is tested in one pass over the players"""
+        x_limit, y_limit = self.x_limit, self.y_limit
+        for p in self.player_list:
+            if (abs(p.x) >= x_limit) or (abs(p.y) >= y_limit):
+                p.freeze()
 
-    def line_intersection_detected(self, x_vec, y_vec, x_last_vec, y_last_vec):
+    def segment_intersection(self, x_seg, y_seg, x_last_vec, y_last_vec):
         """checks to see if the line segment described by x_last_vec
-        & y_last_vec cross any of the lines in x_vec & y_vec"""
+        & y_last_vec crosses the segment (or single point) described
+        by x_seg & y_seg"""
 
         # determine the x and y intersection values
+        x_intersection = ((len(set(x_seg)) % 2) * x_seg[0]) + ((len(set(x_last_vec)) % 2) * x_last_vec[0])
+        y_intersection = ((len(set(y_seg)) % 2) * y_seg[0]) + ((len(set(y_last_vec)) % 2) * y_last_vec[0])
+
+        # determine if the intersection point is a part of both vectors
+        if all([
+            (min(x_seg) <= x_intersection <= max(x_seg)),            # does x intersect with some line
+            (min(x_last_vec) <= x_intersection <= max(x_last_vec)),  # does x intersect with current line
+            (min(y_seg) <= y_intersection <= max(y_seg)),            # does y intersect with some line
+            (min(y_last_vec) <= y_intersection <= max(y_last_vec))   # does y intersect with current line
+        ]):
+            return (x_intersection, y_intersection)  # evaluates to true
+
+    def line_intersection_detected(self, x_vec, y_vec, x_last_vec, y_last_vec):
+        """checks to see if the line segment described by x_last_vec
+        & y_last_vec cross any of the lines in x_vec & y_vec"""
         for i in range(len(x_vec)):
-            x_intersection = ((len(set(x_vec[i:i+2])) % 2) * x_vec[i]) + ((len(set(x_last_vec)) % 2) * x_last_vec[0])
-            y_intersection = ((len(set(y_vec[i:i+2])) % 2) * y_vec[i]) + ((len(set(y_last_vec)) % 2) * y_last_vec[0])
-
-            # determine if the intersection point is a part of both vectors
-            if all([
-                (min(x_vec[i:i+2]) <= x_intersection <= max(x_vec[i:i+2])),  # does x intersect with some line
-                (min(x_last_vec) <= x_intersection <= max(x_last_vec)),      # does x intersect with current line
-                (min(y_vec[i:i+2]) <= y_intersection <= max(y_vec[i:i+2])),  # does y intersect with some line
-                (min(y_last_vec) <= y_intersection <= max(y_last_vec))       # does y intersect with current line
-            ]):
-                return (x_intersection, y_intersection)  # evaluates to true
+            intersection = self.segment_intersection(x_vec[i:i+2], y_vec[i:i+2], x_last_vec, y_last_vec)
+            if intersection:
+                return intersection
+
+    def line_intersection_detected_np(self, x_vec, y_vec, x_last_vec, y_last_vec):
+        """Vectorized version of line_intersection_detected that tests
+        the tail against every segment of x_vec & y_vec in one batch of
+        array operations, returns the same first intersection point.
+        Requires numpy."""
+        import numpy as np  # loaded on first use
+        if len(x_vec) == 0:
+            return None
+        # scalar terms of the tail, same as in segment_intersection
+        x_tail = (len(set(x_last_vec)) % 2) * x_last_vec[0]
+        y_tail = (len(set(y_last_vec)) % 2) * y_last_vec[0]
+
+        # segment i runs from point i to point i+1, the last is a single point
+        x0, y0 = np.asarray(x_vec, dtype=float), np.asarray(y_vec, dtype=float)
+        x1, y1 = np.append(x0[1:], x0[-1]), np.append(y0[1:], y0[-1])
+        x_intersection = (x0 == x1)*x0 + x_tail
+        y_intersection = (y0 == y1)*y0 + y_tail
+
+        # determine which intersection points are a part of both vectors
+        hits = ((np.minimum(x0, x1) <= x_intersection) & (x_intersection <= np.maximum(x0, x1))
+                & (min(x_last_vec) <= x_intersection) & (x_intersection <= max(x_last_vec))
+                & (np.minimum(y0, y1) <= y_intersection) & (y_intersection <= np.maximum(y0, y1))
+                & (min(y_last_vec) <= y_intersection) & (y_intersection <= max(y_last_vec)))
+        if hits.any():
+            i = int(hits.argmax())  # first hit in trace order
+            return (float(x_intersection[i]), float(y_intersection[i]))
+
+    def trace_intersection(self, owner, x_vec, y_vec, stop, x_last_vec, y_last_vec, candidates):
+        """Same as line_intersection_detected on x_vec[:stop] & y_vec[:stop],
+        but the indexed segments of owner's trace are only tested if the
+        segment grid placed them near the tail. Any intersection lies inside
+        both bounding boxes so the skipped segments can never be hit."""
+        indexed = min(self.segment_grid.counts.get(owner, 0), max(stop - 1, 0))
+        stats = self.stats
+        if stats is not None:
+            stats.segments += max(stop - indexed, 0)
+        # check the nearby indexed segments in trace order
+        for k in candidates.get(owner, ()):
+            if k >= indexed:
+                break
+            if stats is not None:
+                stats.segments += 1
+            intersection = self.segment_intersection(x_vec[k:k+2], y_vec[k:k+2], x_last_vec, y_last_vec)
+            if intersection:
+                return intersection
+        # check the segments that are not indexed yet
+        return self.line_intersection_detected(x_vec[indexed:stop], y_vec[indexed:stop], x_last_vec, y_last_vec)
+
+    def swept_tail(self, owner, x_vec, y_vec):
+        """Returns the part of owner's tail that needs checking,
+        see swept_tail"""
+        return swept_tail(self.tail_state, owner, x_vec, y_vec, self.incremental_collisions)
+
+    def live_box(self, owner, x_vec, y_vec):
+        """Returns the bounding box (x_min, x_max, y_min, y_max)
+        of the part of owner's trace that isn't indexed yet"""
+        indexed = self.segment_grid.counts.get(owner, 0)
+        x_live, y_live = x_vec[indexed:], y_vec[indexed:]
+        if x_live:
+            return (min(x_live), max(x_live), min(y_live), max(y_live))
 
     def check_for_line_intersections(self):
         """Calls the check_for_intersection function on each
-        player's last segment using all the lines from all players"""
+        player's last segment using all the lines from all players.
+        Each tail's freezes only depend on the traces, not on who
+        is frozen already, so they are collected for every player
+        and applied at the end, by a CollisionPool if one is attached."""
+        if self.occupancy is not None:
+            return self.check_for_cell_collisions()
 
         # collect indicies & traces
         indices = [i for i in range(len(self.player_list))]
         traces = [p.get_trace() for p in self.player_list]
-        # loop over the player list by index
+        # index any segments closed since the last check
         for i in indices:
-            try:
-                # collect the necessary vectors
-                x_vec, y_vec = traces[i]
-                x_last_vec, y_last_vec = x_vec[-2:], y_vec[-2:]
-
-                # check tail against own trace
-                if self.line_intersection_detected(x_vec[:-3], y_vec[:-3], x_last_vec, y_last_vec):
-                    self.player_list[i].freeze()
-                    continue
-
-                # check tail against other traces
-                for j in [v for v in indices if v != i]:
-                    x_vec, y_vec = traces[j]
-                    intersection = self.line_intersection_detected(x_vec, y_vec, x_last_vec, y_last_vec)
-                    if intersection:  # freeze the appropriate player
-                        pi, pj = (x_last_vec[-1], y_last_vec[-1]), (x_vec[-1], y_vec[-1])
-                        if dist(intersection, pi) < dist(intersection, pj):
-                            self.player_list[i].freeze()  # player i closer to intersection point
-                        elif dist(intersection, pi) > dist(intersection, pj):
-                            self.player_list[j].freeze()  # player j closer to intersection point
-                        else:
-                            self.player_list[i].freeze()  # player i & j equidistant from intersection
-                            self.player_list[j].freeze()
-            except IndexError:
-                pass
+            self.segment_grid.sync(i, *traces[i])
+        tails = [self.swept_tail(i, *traces[i]) for i in indices]
+        if self.pool is not None:
+            frozen = self.pool.check(self, traces, tails)
+        else:
+            live_boxes = [self.live_box(i, *traces[i]) for i in indices]
+            frozen = [j for i in indices for j in self.tail_freezes(i, traces, tails[i], live_boxes)]
+        for j in sorted(set(frozen)):
+            self.player_list[j].freeze()
+
+    def tail_freezes(self, i, traces, tail, live_boxes):
+        """Returns the players that player i's tail freezes,
+        tail is the part of it returned by swept_tail"""
+        frozen = []
+        try:
+            # collect the necessary vectors
+            x_vec, y_vec = traces[i]
+            x_last_vec, y_last_vec = tail
+            if not x_last_vec:
+                return frozen
+            candidates = self.segment_grid.query(x_last_vec, y_last_vec)
+            x_min, x_max = min(x_last_vec), max(x_last_vec)
+            y_min, y_max = min(y_last_vec), max(y_last_vec)
+
+            # check tail against own trace
+            stop = max(len(x_vec) - 3, 0)
+            if self.trace_intersection(i, x_vec, y_vec, stop, x_last_vec, y_last_vec, candidates):
+                frozen.append(i)
+                return frozen
+
+            # check tail against other traces
+            for j in range(len(traces)):
+                box = live_boxes[j]
+                if (j == i) or ((j not in candidates) and not (box and (box[0] <= x_max) and (x_min <= box[1])
+                                                              and (box[2] <= y_max) and (y_min <= box[3]))):
+                    continue  # nothing of player j's trace near the tail
+                x_vec, y_vec = traces[j]
+                intersection = self.trace_intersection(j, x_vec, y_vec, len(x_vec),
+                                                       x_last_vec, y_last_vec, candidates)
+                if intersection:  # freeze the appropriate player
+                    pi, pj = (x_last_vec[-1], y_last_vec[-1]), (x_vec[-1], y_vec[-1])
+                    if dist(intersection, pi) < dist(intersection, pj):
+                        frozen.append(i)  # player i closer to intersection point
+                    elif dist(intersection, pi) > dist(intersection, pj):
+                        frozen.append(j)  # player j closer to intersection point
+                    else:
+                        frozen += (i, j)  # player i & j equidistant from intersection
+        except IndexError:
+            pass
+        return frozen
+
+    def check_for_cell_collisions(self):
+        """Occupancy grid version of check_for_line_intersections"""
+        for j in self.cell_freezes([p.get_trace() for p in self.player_list]):
+            self.player_list[j].freeze()
+
+    def cell_freezes(self, traces):
+        """Returns the players the heads of traces freeze on the
+        occupancy grid. Every head's sweep is tested against the
+        cells covered on earlier ticks and the cells the other heads
+        swept this tick, then marked. A head running into a cell
+        freezes whichever of the two players is closer to it, as in
+        the exact checks."""
+        grid, frozen = self.occupancy, []
+        sweeps = [grid.sweep(i, *trace) for i, trace in enumerate(traces)]
+        swept = {}  # holds cell -> players that swept it this tick
+        for i, cells in enumerate(sweeps):
+            for cell in cells:
+                swept.setdefault(cell, []).append(i)
+        for i, cells in enumerate(sweeps):
+            for cell in cells:
+                j = grid.owner(cell)
+                if j is None:  # free unless another head got there this tick
+                    j = next((k for k in swept[cell] if k != i), None)
+                    if j is None:
+                        continue
+                if j == i:  # ran into their own trail
+                    frozen.append(i)
+                    break
+                point = grid.center(cell)
+                pi, pj = (traces[i][0][-1], traces[i][1][-1]), (traces[j][0][-1], traces[j][1][-1])
+                if dist(point, pi) < dist(point, pj):
+                    frozen.append(i)  # player i closer to the cell
+                elif dist(point, pi) > dist(point, pj):
+                    frozen.append(j)  # player j closer to the cell
+                else:
+                    frozen += (i, j)  # player i & j equidistant from the cell
+                break
+        for i, cells in enumerate(sweeps):
+            [grid.mark(i, cell) for cell in cells]
+        return frozen
 
     def num_players_movable(self):
         """Returns the number of players currently
@@ -200,78 +1117,324 @@ class Game():
         to a csv for debugging purposes"""
         for i, p in enumerate(self.player_list, start=1):
             with open(f'player{i}_trace.csv', 'w') as f:
-                f.write(f"player{i}_x, player{i}_y")
-                [f.write(f"{x},{y}\n") for x, y in zip(*p.get_trace())]
+                f.write(f"player{i}_x, player{i}_y\n")
+                f.writelines(f"{x/p.units},{y/p.units}\n" for x, y in zip(*p.get_trace()))
 
     def game_over(self):
         """Handles clean up and puts a play
         again message after each round."""
+        if not self.renderer:  # nobody to ask when headless
+            return
         # put message on the screen
-        turtle.write(
-            "Play Again? [y/n]",
-            align="center",
-            font=("Arial", 20, "normal")
-        )
-        turtle.hideturtle()
+        self.renderer.write("Play Again? [y/n]")
         # await user input
-        self.screen.onkey(self.play_again_true, 'y')
-        self.screen.onkey(self.play_again_false, 'n')
+        self.onkey(self.play_again_true, 'y')
+        self.onkey(self.play_again_false, 'n')
+        self.renderer.update()
         while self.play_again is None:
-            self.screen.update()
+            self.wait(1/FrameScheduler.render_rate)  # sleeps a frame between polls
         # turn off y/n keys
-        self.screen.onkey(None, 'y')
-        self.screen.onkey(None, 'n')
+        self.onkey(None, 'y')
+        self.onkey(None, 'n')
 
     def setup_players(self):
         """Sets the position, orientation and position of each player.
         Should be called only after all players have been added with
         Game.add_player."""
         # calculate the starting positions
-        n = len(self.player_list)       # number of players
-        w = self.screen.window_width()  # total screen width
-        x = round(float(w/(n+1)), 2)    # spacing between each player
+        n = len(self.player_list)     # number of players
+        w = self.width                # total screen width
+        x = round(float(w/(n+1)), 2)  # spacing between each player
+        self.bounds_fixed = True      # the starting positions depend on the bounds
         # assign starting position and key bindings
         for i, p in enumerate(self.player_list, start=1):
             p.set_starting_pos(((w/2)-(i*x)), 0)  # set starting position
-            p.cursor.left(90)                     # make them point north
+            p.heading = 90                        # make them point north
             # set up the key bindings
-            self.screen.onkey(p.turn_right, p.right_btn)
-            self.screen.onkey(p.turn_left, p.left_btn)
-
-    def run_loop(self):
-        start = now()                       # set the time stamp
-        while True:                         # start the game
-            self.screen.update()            # update the screen always
-            while (now() - start) < 0.040:  # maintain approx 25 fps
-                pass
-            start = now()                   # update the time stamp
-            if not self.paused:             # update the players if not paused
-                # update player state
-                [p.update_score() for p in self.player_list]          # update score
-                [p.update_dist_per_loop() for p in self.player_list]  # update dist
-                [p.move() for p in self.player_list]                  # tell everyone to move
-                self.check_for_border_collisions()                    # players vs screen
-                self.check_for_line_intersections()                   # players vs players
-                if self.num_players_movable() <= self.game_over_limit:
-                    break
+            self.onkey(partial(self.press, i - 1, 'right'), p.right_btn)
+            self.onkey(partial(self.press, i - 1, 'left'), p.left_btn)
+
+    def is_over(self):
+        """Returns true once too few players can move"""
+        return self.num_players_movable() <= self.game_over_limit
+
+    def update_players(self):
+        """Scores, speeds up and moves every player in one pass"""
+        for p in self.player_list:
+            p.update()
+
+    def tick(self, controllers=True):
+        """Advances the game state by one fixed step, the buffered
+        key presses are applied and the controllers decide before
+        anything else happens"""
+        self.apply_pending()
+        if controllers:
+            self.apply_controllers()
+        if self.recorder is not None:
+            self.recorder.capture_inputs(self)  # turns made since the last tick
+        self.tick_count += 1
+        if self.stats is not None:
+            self.stats.timed_tick(self.phases, self.collisions == 'segments')
+        else:
+            # update player state
+            self.update_players()                # score, speed up & move
+            self.check_for_border_collisions()   # players vs screen
+            self.check_for_line_intersections()  # players vs players
+        if self.recorder is not None:
+            self.recorder.capture(self)
+
+    def run_headless(self, max_ticks=None):
+        """Runs the round as fast as possible with no
+        display, returns the number of ticks played"""
+        ticks = 0
+        while not self.is_over() and ticks != max_ticks:
+            self.tick()
+            ticks += 1
+        if self.stats is not None:
+            self.stats.dump()
+        return ticks
+
+    def run_loop(self, scheduler=None):
+        """Runs the round in real time, see FrameScheduler"""
+        scheduler = scheduler or FrameScheduler()
+        stats = self.stats
+        if (stats is not None) and (stats.budget is None):
+            stats.budget = scheduler.tick_dt
+        scheduler.start(now())
+        while True:                                        # start the game
+            t = now()
+            self.apply_pending()                           # pauses apply while paused too
+            for _ in range(scheduler.advance(t, self.paused)):
+                self.tick()                                # update the players
+                if self.is_over():
+                    if stats is not None:
+                        stats.dump()
+                    return
+            if scheduler.render_due(t):
+                start = now()
+                self.render()                              # update the screen
+                if stats is not None:
+                    stats.record('render', now() - start)
+            self.wait(scheduler.sleep_time(now(), self.paused))  # wait for the next deadline
+
+    def wait(self, seconds):
+        """Sleeps for seconds, an attached renderer handles
+        key presses every input_poll seconds meanwhile so they
+        are buffered as they come rather than at the next frame.
+        While paused or over nothing is waiting on them, so they
+        are handled once at the end and idle CPU stays near zero."""
+        if not self.renderer:
+            sleep(seconds)
+            return
+        if self.paused or self.is_over():
+            sleep(seconds)
+            self.renderer.poll()
+            return
+        end = now() + seconds
+        while (left := end - now()) > 0:
+            sleep(min(left, self.input_poll))
+            self.renderer.poll()
+
+
+class TurtleRenderer():
+    """Class that draws a game on the turtle packages Screen.
+    Trails are drawn straight onto its canvas as a few line items
+    that grow as the players turn, each frame only moves the last
+    item of a trail and the head, so frame time doesn't grow with
+    the length of the traces. Nothing is kept per tick: the items
+    are built from the players' turn vertices and the turtles keep
+    no undo history, so memory only grows with the turns."""
+    # class wide variables
+    chunk_vertices = 64  # vertices per line item, full items are never touched again
+    arrow = ((0, 0), (-9, 5), (-7, 0), (-9, -5))  # head outline as (along, across) the heading
+
+    # methods
+    def __init__(self, canvas=None):
+        import turtle  # loaded once something is drawn
+        self.screen = turtle.TurtleScreen(cv=canvas) if canvas else turtle.Screen()
+        self.screen.tracer(False)
+        for t in self.screen.turtles():  # such as the one play_pytron's turtle.speed made
+            t.setundobuffer(None)
+        self.pen = None   # writes the messages
+        self.trails = []  # holds the line items of each player's trail
+        self.points = []  # holds the canvas coordinates of the vertices in the last item per player
+        self.drawn = []   # holds the number of trace vertices drawn per player
+        self.heads = []   # holds the (x, y, heading) last drawn per player
+        self.arrows = []  # holds the head item per player
+        self.frames = 0   # number of frames that changed the canvas
+        self.configure_id = None  # funcid of the <Configure> binding, the screen outlives the renderer
+
+    def attach(self, game):
+        """Binds the game's keys and takes the playfield
+        size from the screen, the size is only read again
+        when the window is resized"""
+        for key, fun in game.key_bindings.items():
+            self.onkey(fun, key)
+        window = self.screen.getcanvas().winfo_toplevel()  # a ScrolledCanvas doesn't return the funcid
+        self.configure_id = window.bind('<Configure>', lambda event: self.resize(game), add='+')
+        self.resize(game)
+
+    def detach(self):
+        """Drops the <Configure> binding so the screen, which is
+        shared by every round, no longer holds on to the game"""
+        if self.configure_id is None:
+            return
+        from tkinter import TclError
+        try:
+            window = self.screen.getcanvas().winfo_toplevel()
+            # unbind(sequence, funcid) drops every binding of the sequence before Python 3.13
+            script = window.bind('<Configure>')
+            window.bind('<Configure>', '\n'.join(line for line in script.split('\n') if self.configure_id not in line))
+            window.deletecommand(self.configure_id)
+        except TclError:  # the window was closed
+            pass
+        self.configure_id = None
+
+    def resize(self, game):
+        """Takes the playfield size from the window until the
+        players are set up, after that the bounds stay as they
+        were recorded so a replay plays the same round"""
+        if not game.bounds_fixed:
+            game.set_bounds(self.screen.window_width(), self.screen.window_height())
+
+    def onkey(self, fun, key):
+        self.screen.onkey(fun, key)
+
+    def listen(self):
+        self.screen.listen()
+
+    def update(self):
+        self.screen.update()
+
+    def poll(self):
+        """Handles waiting events, nothing new is drawn
+        between frames so the canvas has nothing to redraw"""
+        self.screen.getcanvas().update()
+
+    def write(self, message):
+        """Puts a message in the middle of the screen
+        in place of the last one"""
+        if self.pen is None:
+            import turtle
+            self.pen = turtle.RawTurtle(self.screen)
+            self.pen.hideturtle()
+            self.pen.setundobuffer(None)
+        self.pen.clear()  # deletes the last message's item
+        self.pen.write(message, align="center", font=("Arial", 20, "normal"))
+
+    def add_trail(self):
+        """Creates the head item for the next player"""
+        self.trails.append([])
+        self.points.append([])
+        self.drawn.append(0)
+        self.heads.append(None)
+        self.arrows.append(self.screen.getcanvas().create_polygon(0, 0, 0, 0, 0, 0, fill='black'))
+
+    def clear_trail(self, i):
+        """Deletes the line items of player i's trail"""
+        canvas = self.screen.getcanvas()
+        for item in self.trails[i]:
+            canvas.delete(item)
+        self.trails[i], self.points[i], self.drawn[i] = [], [], 0
+
+    def render(self, game):
+        """Extends each player's trail to its current position.
+        Players that haven't moved are skipped, if nobody moved
+        the canvas has nothing to redraw and the update only
+        handles events."""
+        canvas = self.screen.getcanvas()
+        units = Player.units  # traces are in units, the canvas in pixels
+        xscale, yscale = self.screen.xscale/units, -self.screen.yscale/units  # canvas y points down
+        while len(self.trails) < len(game.player_list):
+            self.add_trail()
+        changed = False
+        for i, p in enumerate(game.player_list):
+            n = len(p.x_vec)
+            if n < self.drawn[i]:  # the trace was reset
+                self.clear_trail(i)
+            head = (p.x, p.y, p.heading)
+            if n == self.drawn[i] and head == self.heads[i]:
+                continue  # nothing new to draw
+            changed = True
+            trail, points = self.trails[i], self.points[i]
+            if n and not trail:
+                trail.append(canvas.create_line(0, 0, 0, 0, fill='black', capstyle='round'))
+            for k in range(self.drawn[i], n):
+                if len(points) == 2*self.chunk_vertices:  # leave the full item be
+                    canvas.coords(trail[-1], *points)
+                    del points[:-2]  # the next item starts at its last vertex
+                    trail.append(canvas.create_line(0, 0, 0, 0, fill='black', capstyle='round'))
+                points += (p.x_vec[k]*xscale, p.y_vec[k]*yscale)
+            self.drawn[i] = n
+            hx, hy = p.x*xscale, p.y*yscale
+            if trail:
+                canvas.coords(trail[-1], *points, hx, hy)  # only the open item moves
+            dx, dy = Player.directions[p.heading]
+            canvas.coords(self.arrows[i], *(c for a, b in self.arrow
+                                            for c in (hx + a*dx - b*dy, hy - a*dy - b*dx)))
+            self.heads[i] = head
+        if changed:
+            self.frames += 1
+        canvas.update()  # redraws only the changed items and pumps Tk
+
+
+# ================== functions ==================
+def swept_tail(tail_state, owner, x_vec, y_vec, incremental=True):
+    """Returns the part of owner's tail that needs checking. While
+    the tail keeps extending along one axis the part checked on
+    earlier ticks is skipped and only the distance moved since the
+    last check is returned, nothing at all if it didn't move. After
+    a turn or reset the whole tail is returned. tail_state holds
+    owner -> tail at the last check and is updated."""
+    x_last_vec, y_last_vec = x_vec[-2:], y_vec[-2:]
+    if len(x_last_vec) < 2:
+        tail_state.pop(owner, None)
+        return x_last_vec, y_last_vec
+    (x0, x1), (y0, y1) = x_last_vec, y_last_vec
+    previous = tail_state.get(owner)
+    tail_state[owner] = (len(x_vec), x0, y0, x1, y1)
+    if not incremental or (previous is None) or (previous[:3] != (len(x_vec), x0, y0)):
+        return x_last_vec, y_last_vec  # first check or the tail starts somewhere new
+    px1, py1 = previous[3:]
+    if (px1, py1) == (x1, y1):
+        return [], []  # didn't move
+    if (x0 == x1 or y0 == y1) and (min(x0, x1) <= px1 <= max(x0, x1)) \
+            and (min(y0, y1) <= py1 <= max(y0, y1)):
+        return [px1, x1], [py1, y1]  # only the swept part
+    return x_last_vec, y_last_vec
 
 
-def play_pytron(key_bindings):
+def play_pytron(key_bindings, stats=None, recording='pytron_recording.bin', replay=None, until_tick=None):
+    import turtle
+    from tkinter import TclError
+    game = None
     try:
         turtle.speed(0)           # no animations
         turtle.delay(0)           # no delays
         turtle.Screen().clear()   # reset screen
         turtle.title('pytron')    # add a title
-        game = Game()             # create a new game object
+        game = Game(stats=stats)  # create a new game object
+        game.attach_renderer(TurtleRenderer())
 
         for binding in key_bindings:  # add players
             game.add_player(Player(key_bindings=binding))
 
-        game.setup_players()    # set up the players
-        game.screen.listen()    # start listening for events
-        game.run_loop()         # start the round
-        game.game_over()        # handles cleanup
-        game.save_data()        # saves data for debugging
-        return game.play_again  # returns boolean value
+        if replay:                # play on the recorded playfield
+            replay = Recording(replay)
+            game.set_bounds(replay.width, replay.height)
+        game.setup_players()      # set up the players
+        if replay:                # fast forward through a recorded round
+            game.replay(replay.inputs(), until_tick)
+        if recording:             # stream the round for debugging
+            game.attach_recorder(Recorder(recording))
+        game.renderer.listen()    # start listening for events
+        game.run_loop()           # start the round
+        game.game_over()          # handles cleanup
+        return game.play_again    # returns boolean value
     except (TclError, turtle.Terminator):
         pass
+    finally:
+        if game and game.recorder:
+            game.recorder.close(game)  # keep what was played even if the window was closed
+        if game and game.renderer:
+            game.renderer.detach()
@@ -0,0 +1,200 @@
+# ================================================= #
+# Author: Samuel Law                                #
+# Title: Line Crossing Game - recorder              #
+#                                                   #
+# Description:                                      #
+# Streams trace vertices and tick metadata to a     #
+# compact binary file while the game is played      #
+# and loads it back as arrays                       #
+# ================================================= #
+
+import struct
+from array import array
+from mmap import mmap, ACCESS_READ
+from os.path import getsize
+from queue import SimpleQueue
+from threading import Thread
+from timeit import default_timer as now
+
+
+# ================== file format ==================
+# a 24 byte header followed by 24 byte records, all little endian
+HEADER = struct.Struct('<4sHHdd')  # magic, version, number of players, width, height
+RECORD = struct.Struct('<BxHIdd')  # kind, player, tick, x, y in pixels
+MAGIC, VERSION = b'PYTR', 2
+VERSIONS = (1, 2)  # versions read back, 1 has no rewinds
+
+# record kinds
+VERTEX = 0  # a trace vertex (start or turn) of player at x, y
+FREEZE = 1  # player stopped moving at x, y
+TICK = 2    # end of tick, player holds the number of players movable, x the seconds since start
+HEAD = 3    # position of player when the recording was closed
+INPUT = 4   # key press logged by player after tick ticks, x holds the index in ACTIONS
+REWIND = 5  # game restored to tick, x holds the vertices of player or the key presses kept
+ACTIONS = ('left', 'right', 'pause')
+NO_PLAYER = 0xFFFF  # player of key presses that don't belong to one
+RECORD_FIELDS = [('kind', '<u1'), ('pad', '<u1'), ('player', '<u2'),  # numpy dtype of a record
+                 ('tick', '<u4'), ('x', '<f8'), ('y', '<f8')]
+
+
+# ================== classes ==================
+class Recorder():
+    """Appends a game's trace vertices, freezes and tick metadata to
+    a binary file while it is played. Records are packed into a batch
+    in the frame loop and the batches are written and flushed by a
+    background thread, so a crash only loses the last batch."""
+    # class wide variables
+    batch_ticks = 25  # ticks per batch, about a second of play
+
+    # methods
+    def __init__(self, path, batch_ticks=None):
+        self.path = path
+        self.batch_ticks = batch_ticks or self.batch_ticks
+        self.batch = bytearray()  # records not handed to the writer yet
+        self.counts = []          # holds the number of vertices recorded per player
+        self.inputs = 0           # number of key presses recorded
+        self.movable = []         # holds the movable flag recorded per player
+        self.start_time = None
+        self.queue = SimpleQueue()
+        self.writer = None
+
+    def start(self, game):
+        """Writes the header and any vertices the
+        players already have, then starts the writer"""
+        self.file = open(self.path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, VERSION, len(game.player_list), game.width, game.height))
+        self.file.flush()
+        self.counts = [0 for _ in game.player_list]
+        self.movable = [1 for _ in game.player_list]
+        self.start_time = now()
+        self.writer = Thread(target=self.write_batches, daemon=True)
+        self.writer.start()
+        self.capture_inputs(game)
+
+    def write_batches(self):
+        """Writes batches from the queue until a None arrives"""
+        while (batch := self.queue.get()) is not None:
+            self.file.write(batch)
+            self.file.flush()
+        self.file.close()
+
+    def capture_inputs(self, game):
+        """Records the key presses and the vertices
+        they added since the last capture"""
+        for tick, player, action in game.input_log[self.inputs:]:
+            player = NO_PLAYER if player is None else player
+            self.batch += RECORD.pack(INPUT, player, tick, ACTIONS.index(action), 0.0)
+        self.inputs = len(game.input_log)
+        for i, p in enumerate(game.player_list):
+            for k in range(self.counts[i], len(p.x_vec)):
+                self.batch += RECORD.pack(VERTEX, i, game.tick_count, p.x_vec[k]/p.units, p.y_vec[k]/p.units)
+            self.counts[i] = len(p.x_vec)
+
+    def rewind(self, game):
+        """Records that Game.restore cut the traces and the input
+        log back, so what is captured next follows on from the
+        restored state rather than from what was recorded"""
+        self.inputs = min(self.inputs, len(game.input_log))
+        self.batch += RECORD.pack(REWIND, NO_PLAYER, game.tick_count, self.inputs, 0.0)
+        for i, p in enumerate(game.player_list):
+            self.counts[i] = min(self.counts[i], len(p.x_vec))
+            self.movable[i] = p.movable
+            self.batch += RECORD.pack(REWIND, i, game.tick_count, self.counts[i], 0.0)
+
+    def capture(self, game):
+        """Records the changes made by the tick just played,
+        Game.tick captures turns before it starts so they are
+        stamped with the number of ticks played before them"""
+        for i, p in enumerate(game.player_list):
+            if self.movable[i] and not p.movable:
+                self.batch += RECORD.pack(FREEZE, i, game.tick_count, *p.get_pos())
+                self.movable[i] = 0
+        self.batch += RECORD.pack(TICK, game.num_players_movable(), game.tick_count,
+                                  now() - self.start_time, 0.0)
+        if game.tick_count % self.batch_ticks == 0:
+            self.flush()
+
+    def flush(self):
+        """Hands the current batch to the writer thread"""
+        if self.batch:
+            self.queue.put(bytes(self.batch))
+            self.batch.clear()
+
+    def close(self, game):
+        """Records the final head positions, writes
+        everything out and closes the file"""
+        self.capture_inputs(game)
+        for i, p in enumerate(game.player_list):
+            self.batch += RECORD.pack(HEAD, i, game.tick_count, *p.get_pos())
+        self.flush()
+        self.queue.put(None)
+        self.writer.join()
+
+
+class Recording():
+    """A recording loaded back from disk, every field of
+    the records is held in its own array"""
+
+    # methods
+    def __init__(self, path):
+        with open(path, 'rb') as f, mmap(f.fileno(), 0, access=ACCESS_READ) as data:
+            magic, version, self.n_players, self.width, self.height = HEADER.unpack_from(data)
+            if (magic != MAGIC) or (version not in VERSIONS):
+                raise ValueError(f"{path} is not a pytron recording")
+            # a crash can leave a partial record at the end
+            end = HEADER.size + ((len(data) - HEADER.size)//RECORD.size)*RECORD.size
+            fields = list(zip(*RECORD.iter_unpack(data[HEADER.size:end]))) or [(), (), (), (), ()]
+        kind, player, tick, x, y = fields
+        self.kind, self.player = array('B', kind), array('H', player)
+        self.tick, self.x, self.y = array('I', tick), array('d', x), array('d', y)
+
+    def __len__(self):
+        return len(self.kind)
+
+    def traces(self):
+        """Returns [(x_vec, y_vec), ...] with the vertices of each
+        player followed by their final head position if recorded"""
+        traces = [(array('d'), array('d')) for _ in range(self.n_players)]
+        for kind, player, x, y in zip(self.kind, self.player, self.x, self.y):
+            if (kind == REWIND) and (player != NO_PLAYER):
+                x_vec, y_vec = traces[player]
+                del x_vec[int(x):], y_vec[int(x):]
+            elif kind in (VERTEX, HEAD):
+                x_vec, y_vec = traces[player]
+                if kind == VERTEX or not x_vec or (x, y) != (x_vec[-1], y_vec[-1]):
+                    x_vec.append(x)
+                    y_vec.append(y)
+        return traces
+
+    def inputs(self):
+        """Returns the logged key presses as
+        [(tick, player, action), ...] for Game.replay"""
+        inputs = []
+        for kind, player, tick, x in zip(self.kind, self.player, self.tick, self.x):
+            if kind == INPUT:
+                inputs.append((tick, None if player == NO_PLAYER else player, ACTIONS[int(x)]))
+            elif (kind == REWIND) and (player == NO_PLAYER):
+                del inputs[int(x):]
+        return inputs
+
+    def ticks(self):
+        """Returns the number of ticks recorded, less
+        those undone by a rewind"""
+        ticks = []  # tick count after each recorded tick
+        for kind, player, tick in zip(self.kind, self.player, self.tick):
+            if kind == TICK:
+                ticks.append(tick)
+            elif (kind == REWIND) and (player == NO_PLAYER):
+                while ticks and ticks[-1] > tick:
+                    ticks.pop()
+        return len(ticks)
+
+
+def load_records(path):
+    """Returns the records of a recording as a numpy structured
+    array that maps the file rather than reading it. Requires numpy."""
+    import numpy as np  # loaded on first use
+    n = (getsize(path) - HEADER.size)//RECORD.size
+    if n <= 0:
+        return np.empty(0, dtype=RECORD_FIELDS)
+    return np.memmap(path, dtype=RECORD_FIELDS, mode='r', offset=HEADER.size, shape=(n,))
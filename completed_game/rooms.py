@@ -0,0 +1,178 @@
+# ================================================= #
+# Author: Samuel Law                                #
+# Title: Line Crossing Game - rooms                 #
+#                                                   #
+# Description:                                      #
+# Hosts many headless games in one process, every   #
+# room ticks on one shared scheduler                #
+# ================================================= #
+
+import asyncio
+import json
+import sys
+from random import Random
+from timeit import default_timer as now
+from pytron import Game, Player, FrameScheduler
+
+
+# ================== classes ==================
+class Room():
+    """One match, only the game and the key presses
+    waiting for the next tick are kept"""
+    __slots__ = ('room_id', 'game', 'pending')
+
+    # methods
+    def __init__(self, room_id, game):
+        self.room_id = room_id
+        self.game = game
+        self.pending = []  # holds (player, action) until the next tick
+
+
+class RoomManager():
+    """Hosts many headless games. Only rooms that are playing are
+    kept in the active set that every shared tick walks over, rooms
+    that are paused or over drop out of it and cost nothing until a
+    key press for them arrives."""
+    # class wide variables
+    actions = ('left', 'right', 'pause')
+
+    # methods
+    def __init__(self, scheduler=None):
+        self.scheduler = scheduler or FrameScheduler()
+        self.rooms = {}       # holds room_id -> Room
+        self.active = {}      # holds room_id -> Room for the rooms being ticked, in order
+        self.next_id = 0
+        self.room_ticks = 0   # ticks played over all rooms
+        self.wake = None      # set when an idle manager has work again
+
+    def create_room(self, n_players=2, width=None, height=None):
+        """Sets up a paused game and returns its room id"""
+        game = Game(width=width, height=height)
+        for _ in range(n_players):  # add players
+            game.add_player(Player())
+        game.setup_players()        # set up the players
+        room = Room(self.next_id, game)
+        self.rooms[room.room_id] = room
+        self.next_id += 1
+        return room.room_id
+
+    def close_room(self, room_id):
+        self.active.pop(room_id, None)
+        return self.rooms.pop(room_id)
+
+    def join(self, room_id, player):
+        """Returns a LoopbackClient playing player in room_id"""
+        return LoopbackClient(self, room_id, player)
+
+    def send(self, room_id, player, action):
+        """Queues a key press for the room's next tick. Presses
+        for rooms that aren't being ticked are applied straight
+        away as they may start the room again."""
+        room = self.rooms[room_id]
+        room.pending.append((player, action))
+        if room_id not in self.active:
+            self.apply_pending(room)
+            self.update_active(room)
+
+    def apply_pending(self, room):
+        """Applies the queued key presses, presses for unknown
+        players or actions are dropped"""
+        game = room.game
+        for player, action in room.pending:
+            if (action == 'pause') or ((action in self.actions) and (player in range(len(game.player_list)))):
+                game.handle_input(None if action == 'pause' else player, action)
+        room.pending.clear()
+
+    def update_active(self, room):
+        """Adds or removes room from the active set"""
+        if room.game.paused or room.game.is_over():
+            self.active.pop(room.room_id, None)
+        else:
+            self.active[room.room_id] = room
+            if self.wake:
+                self.wake.set()
+
+    def step(self):
+        """Plays one tick in every active room"""
+        for room in list(self.active.values()):
+            if room.pending:
+                self.apply_pending(room)
+            game = room.game
+            if not game.paused:
+                game.tick()
+                self.room_ticks += 1
+            if game.paused or game.is_over():
+                del self.active[room.room_id]
+
+    async def run(self, until=None):
+        """Ticks the active rooms in real time on the shared
+        scheduler until the coroutine is cancelled or until()
+        returns true. Sleeps on an event while no room is active."""
+        scheduler = self.scheduler
+        self.wake = asyncio.Event()
+        scheduler.start(now())
+        while not (until and until()):
+            if not self.active:
+                self.wake.clear()
+                await self.wake.wait()  # nothing to tick
+                scheduler.start(now())
+            t = now()
+            for _ in range(scheduler.advance(t)):
+                self.step()
+            scheduler.render_due(t)  # keeps the frame deadline moving for sleep_time
+            await asyncio.sleep(scheduler.sleep_time(now()))
+
+
+class LoopbackClient():
+    """Stand in for a remote player, presses keys and reads
+    the room's state the way a network client would"""
+    __slots__ = ('manager', 'room_id', 'player')
+
+    # methods
+    def __init__(self, manager, room_id, player):
+        self.manager = manager
+        self.room_id = room_id
+        self.player = player
+
+    def press(self, action):
+        self.manager.send(self.room_id, self.player, action)
+
+    def state(self):
+        """Returns the room's tick and (x, y, heading,
+        movable, score) of every player"""
+        game = self.manager.rooms[self.room_id].game
+        return {'tick': game.tick_count, 'paused': game.paused,
+                'players': [(*p.get_pos(), p.heading, p.movable, p.score) for p in game.player_list]}
+
+
+# ================== load test ==================
+def load_test(room_counts=(10, 100, 1_000, 5_000), ticks=100, n_players=2, turn_rate=0.02, seed=0):
+    """Steps room_counts rooms for ticks shared ticks with loopback
+    clients pressing keys at random, half of the rooms are left
+    paused. Returns one record of room ticks per second per count."""
+    results = []
+    for n_rooms in room_counts:
+        rng = Random(seed)
+        manager = RoomManager()
+        clients = []
+        for r in range(n_rooms):
+            room_id = manager.create_room(n_players)
+            clients += [manager.join(room_id, i) for i in range(n_players)]
+            if r % 2 == 0:  # start every other room
+                clients[-1].press('pause')
+        start = now()
+        for _ in range(ticks):
+            for client in clients:
+                if rng.random() < turn_rate:
+                    client.press(rng.choice(('left', 'right')))
+            manager.step()
+        seconds = now() - start
+        results.append({'rooms': n_rooms, 'ticks': ticks, 'room_ticks': manager.room_ticks,
+                        'seconds': seconds, 'room_ticks_per_s': manager.room_ticks/seconds,
+                        'shared_ticks_per_s': ticks/seconds})
+    return results
+
+
+if __name__ == "__main__":
+    for record in load_test():
+        sys.stdout.write(json.dumps(record) + '\n')
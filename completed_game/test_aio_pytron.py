@@ -0,0 +1,113 @@
+#!../.venv/Scripts/python.exe
+import asyncio
+import unittest
+from pytron import FrameScheduler
+from aio_pytron import InputQueue, AsyncGameLoop, parse_input, serve_inputs, play_headless_games
+from fixtures import new_game
+
+
+class TestAsyncGameLoop(unittest.TestCase):
+    # ============= tests =============
+    def test_run_headless(self):
+        """Test that the async loop plays the same
+        round as Game.run_headless"""
+        game, expected = new_game(), new_game()
+        asyncio.run(AsyncGameLoop(game, realtime=False).run())
+        expected.run_headless()
+        self.assertEqual(game.tick_count, expected.tick_count)
+
+    def test_run_realtime(self):
+        """Test that a realtime round ticks on the scheduler"""
+        game = new_game(size=40)
+        loop = AsyncGameLoop(game, scheduler=FrameScheduler(tick_rate=1000, render_rate=100))
+        asyncio.run(loop.run())
+        self.assertEqual(game.tick_count, 10)
+
+    def test_inputs_between_ticks(self):
+        """Test that queued and scripted events are applied
+        between ticks and logged with the tick"""
+        game = new_game(paused=True)
+        loop = AsyncGameLoop(game, realtime=False, script=[(10, 0, 'left')])
+        game.press(None, 'pause')  # key bindings feed the queue
+        self.assertTrue(game.paused)
+        asyncio.run(loop.run())
+        self.assertEqual(game.input_log, [(0, None, 'pause'), (10, 0, 'left')])
+        self.assertEqual(game.player_list[0].movable, 0)  # ran into player 2
+
+    def test_script_realtime(self):
+        """Test that a scripted event is applied once in a
+        realtime round although inputs are applied after each tick"""
+        game = new_game(size=40)
+        heading = game.player_list[0].heading
+        loop = AsyncGameLoop(game, scheduler=FrameScheduler(tick_rate=1000, render_rate=100),
+                             script=[(5, 0, 'left')])
+        asyncio.run(loop.run())
+        self.assertEqual(game.input_log, [(5, 0, 'left')])
+        self.assertEqual(game.player_list[0].heading, (heading + 90) % 360)
+
+    def test_script_paused(self):
+        """Test that events queued while paused don't
+        apply the script of the tick again"""
+        async def play(loop):
+            task = asyncio.create_task(loop.run())
+            await asyncio.sleep(0)
+            loop.inputs.put(1, 'right')
+            await asyncio.sleep(0)
+            loop.inputs.put(None, 'pause')
+            return await task
+        game = new_game(paused=True)
+        asyncio.run(play(AsyncGameLoop(game, realtime=False, script=[(0, 0, 'left')])))
+        self.assertEqual(game.input_log, [(0, 0, 'left'), (0, 1, 'right'), (0, None, 'pause')])
+
+    def test_bad_inputs_dropped(self):
+        game = new_game()
+        loop = AsyncGameLoop(game, realtime=False)
+        for event in [(5, 'left'), (0, 'jump'), ('0', 'left'), (None, 'left')]:
+            loop.apply(*event)
+        self.assertEqual(game.input_log, [])
+
+    def test_many_games(self):
+        """Test that games run side by side in one process"""
+        games = [new_game(n, 200 + 10*n) for n in range(1, 6)]
+        asyncio.run(play_headless_games(games))
+        self.assertTrue(all(game.is_over() for game in games))
+
+    def test_prompt_play_again(self):
+        """Test that the prompt waits for a yes or no event"""
+        async def answer(loop):
+            task = asyncio.create_task(loop.prompt_play_again())
+            await asyncio.sleep(0.01)
+            self.assertFalse(task.done())
+            loop.inputs.put(None, 'no')
+            return await task
+        loop = AsyncGameLoop(new_game(), scheduler=FrameScheduler(render_rate=200))
+        self.assertIs(asyncio.run(answer(loop)), False)
+
+
+class TestInputSources(unittest.TestCase):
+    # ============= tests =============
+    def test_parse_input(self):
+        self.assertEqual(parse_input("1 right\n"), (1, 'right'))
+        self.assertEqual(parse_input("pause"), (None, 'pause'))
+        self.assertIsNone(parse_input("left"))
+        self.assertIsNone(parse_input("-1 left"))
+
+    def test_serve_inputs(self):
+        """Test that lines sent to the socket reach the queue"""
+        async def send():
+            inputs = InputQueue()
+            server = await serve_inputs(inputs)
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(b"0 left\nnonsense\npause\n")
+            await writer.drain()
+            events = [await inputs.get(timeout=1), await inputs.get(timeout=1)]
+            writer.close()
+            server.close()
+            await server.wait_closed()
+            return events
+        self.assertEqual(asyncio.run(send()), [(0, 'left'), (None, 'pause')])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+#!../.venv/Scripts/python.exe
+import unittest
+from batch import GameConfig, play_headless, play_pytron_batch, random_bot
+from bots import RandomBot
+
+
+class TestBatch(unittest.TestCase):
+    # ============= tests =============
+    def test_play_headless(self):
+        """Test that two players running north
+        both die at the top of the playfield"""
+        result = play_headless(GameConfig(width=200, height=200))
+        self.assertIsNone(result.winner)
+        self.assertEqual(result.ticks, 50)
+        self.assertEqual(result.scores, (100.0, 100.0))
+        self.assertEqual(result.deaths, ((50, 33.33, 100.0), (50, -33.34, 100.0)))
+
+    def test_scripted_inputs(self):
+        """Test that player 2 wins when player 1
+        turns into player 2's line"""
+        config = GameConfig(width=300, height=300, inputs=[(10, 0, 'left')])
+        result = play_headless(config)
+        self.assertEqual(result.winner, 2)
+        self.assertEqual(result.deaths[0][1:], (-50.0, 20.0))
+        self.assertIsNone(result.deaths[1])
+
+    def test_max_ticks(self):
+        """Test that a round can be cut short"""
+        result = play_headless(GameConfig(max_ticks=10))
+        self.assertEqual(result.ticks, 10)
+        self.assertEqual(result.deaths, (None, None))
+
+    def test_controllers(self):
+        """Test that each player gets a controller from its
+        factory, seeded from the round's seed"""
+        config = GameConfig(seed=3, width=300, height=300, controllers=(RandomBot, None))
+        result = play_headless(config)
+        self.assertEqual(result, play_headless(config))
+        self.assertNotEqual(result.deaths[0], play_headless(GameConfig(width=300, height=300)).deaths[0])
+
+    def test_batch_matches_serial(self):
+        """Test that the pool returns the same results
+        in the same order as playing each round in turn"""
+        configs = [GameConfig(seed=s, n_players=3, bot=random_bot) for s in range(8)]
+        results = play_pytron_batch(configs, max_workers=2)
+        self.assertEqual(results, [play_headless(c) for c in configs])
+        self.assertEqual([r.seed for r in results], list(range(8)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+#!../.venv/Scripts/python.exe
+import json
+import unittest
+from io import StringIO
+from os import remove
+from tempfile import NamedTemporaryFile
+from bench_pytron import zig_zag, make_game, run, compare
+
+
+class TestBench(unittest.TestCase):
+    # ============= tests =============
+    def test_zig_zag(self):
+        x_vec, y_vec = zig_zag(5, width=10, step=2)
+        self.assertEqual(list(x_vec), [0, 1000, 1000, 0, 0])  # in units
+        self.assertEqual(list(y_vec), [0, 0, 200, 200, 400])
+
+    def test_make_game(self):
+        """Test that the generated players have room to move"""
+        game = make_game(4, 101)
+        for _ in range(100):
+            game.tick()
+        self.assertEqual(game.num_players_movable(), 4)
+
+    def test_run(self):
+        """Test that every case writes a JSON record"""
+        out = StringIO()
+        records = run([100], [2], repeat=1, out=out)
+        lines = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(lines[0]['bench'], 'meta')
+        self.assertEqual(lines[1:], records)
+        benches = {r['bench'] for r in records}
+        for bench in ['line_intersection_detected', 'check_for_line_intersections', 'get_trace',
+                      'check_for_border_collisions', 'tick']:
+            self.assertIn(bench, benches)
+
+    def test_compare(self):
+        """Test that only cases slower than the threshold are reported"""
+        baseline = [{'bench': 'meta'},
+                    {'bench': 'tick', 'vertices': 100, 'players': 2, 'best_s': 1.0},
+                    {'bench': 'get_trace', 'vertices': 100, 'players': 1, 'best_s': 1.0}]
+        records = [{'bench': 'tick', 'vertices': 100, 'players': 2, 'best_s': 2.0},
+                   {'bench': 'get_trace', 'vertices': 100, 'players': 1, 'best_s': 1.1}]
+        with NamedTemporaryFile('w', suffix='.jsonl', delete=False) as f:
+            f.write('\n'.join(json.dumps(r) for r in baseline))
+        try:
+            self.assertEqual(compare(records, f.name, 1.25), records[:1])
+        finally:
+            remove(f.name)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,170 @@
+#!../.venv/Scripts/python.exe
+import unittest
+from array import array
+from random import Random
+from pytron import Controller, GameView
+from bots import ForkedTrace, Lookahead, LookaheadBot
+from fixtures import new_game
+
+
+class Scripted(Controller):
+    """Turns left on the given ticks"""
+
+    def __init__(self, ticks):
+        self.ticks = ticks
+
+    def decide(self, view):
+        if view.tick in self.ticks:
+            return 'left'
+
+
+class TestController(unittest.TestCase):
+    # ============= tests =============
+    def test_decide_is_logged(self):
+        """Test that a controller's turns are applied before
+        the tick and logged like key presses"""
+        game = new_game(controllers=[Scripted({3})])
+        [game.tick() for _ in range(5)]
+        self.assertEqual(game.input_log, [(3, 0, 'left')])
+        self.assertEqual(game.player_list[0].heading, 180)
+
+    def test_view(self):
+        """Test that the view shows the game without copying traces"""
+        game = new_game()
+        game.tick()
+        view = GameView(game, 1)
+        self.assertEqual(view.bounds, (150, 150))
+        self.assertEqual(view.heads()[1], (-50.0, 2.0, 90, 1))
+        self.assertIs(view.traces()[0][0].vertices, game.player_list[0].x_vec)
+
+    def test_replay_skips_controllers(self):
+        """Test that replaying a bot's round doesn't ask it again"""
+        game = new_game(controllers=[Scripted({3, 10})])
+        game.run_headless()
+        again = new_game(paused=True, controllers=[Scripted({5})])
+        again.replay(game.input_log)
+        self.assertEqual(again.input_log, game.input_log)
+        self.assertEqual(again.tick_count, game.tick_count)
+
+
+class TestLookahead(unittest.TestCase):
+    # ============= tests =============
+    def test_forked_trace(self):
+        """Test that a forked trace indexes and slices like
+        the buffer and the added vertices joined together"""
+        joined = list(range(10))
+        trace = ForkedTrace(array('i', joined[:6]), joined[6:])
+        self.assertEqual((len(trace), list(trace)), (10, joined))
+        for k in range(-10, 10):
+            self.assertEqual(trace[k], joined[k])
+        for start in range(-3, 12):
+            for stop in range(-3, 12):
+                self.assertEqual(trace[start:stop], joined[start:stop])
+
+    def test_matches_game(self):
+        """Test that stepping the lookahead, fast or through the
+        game's own checks, gives the same positions and freezes as
+        ticking a copy of the game"""
+        for seed in range(200):
+            rng = Random(seed)
+            n, size = rng.choice((2, 3, 4, 6)), rng.choice((100, 200))
+            game = new_game(n, size)
+            for _ in range(rng.randrange(60)):
+                for i in range(n):
+                    if rng.random() < 0.1:
+                        game.handle_input(i, rng.choice(('left', 'right')))
+                game.tick()
+            if rng.random() < 0.5:  # a turn the grid hasn't seen yet
+                game.handle_input(0, rng.choice(('left', 'right')))
+            sims = [Lookahead(game), Lookahead(game, reference=True)]
+            copy = new_game(n, size)
+            copy.replay(game.input_log, game.tick_count)
+            while not copy.is_over():
+                actions = [(i, rng.choice(('left', 'right'))) for i in range(n) if rng.random() < 0.15]
+                [copy.handle_input(i, a) for i, a in actions]
+                copy.tick()
+                for sim in sims:
+                    sim.step(actions)
+                    self.assertEqual([((x, y), m) for x, y, m in zip(sim.x, sim.y, sim.movable)],
+                                     [((p.x, p.y), p.movable) for p in copy.player_list])
+            self.assertTrue(all(sim.is_over() for sim in sims))
+
+    def test_equidistant(self):
+        """Test that a tail crossing a trace as far from
+        its head as the other head freezes both players"""
+        game = new_game(size=200, paused=True)
+        a, b = game.player_list
+        a.x_vec[0], a.y_vec[0], (a.x, a.y), a.heading = 0, -100, (0, 100), 90
+        b.x_vec[0], b.y_vec[0], (b.x, b.y), b.heading = -1000, 0, (100, 0), 0
+        game.tail_state = {1: (2, -1000, 0, 100, 0)}  # b checked up to its head, a not at all
+        for sim in (Lookahead(game), Lookahead(game, reference=True)):
+            sim.step()
+            self.assertEqual((sim.x, sim.y, sim.movable), ([0, 300], [300, 0], [0, 0]))
+
+    def test_matches_occupancy(self):
+        """Test that with the occupancy backend the lookahead
+        steps like the game and leaves its grid as it was"""
+        for seed in range(30):
+            rng = Random(seed)
+            n = rng.choice((2, 3, 4))
+            game = new_game(n, 200, collisions='occupancy')
+            for _ in range(rng.randrange(1, 30)):
+                [game.handle_input(i, rng.choice(('left', 'right'))) for i in range(n) if rng.random() < 0.1]
+                game.tick()
+            cells = (bytes(game.occupancy.owners), game.occupancy.snapshot()[1:])
+            sim = Lookahead(game)
+            copy = new_game(n, 200, collisions='occupancy')
+            copy.replay(game.input_log, game.tick_count)
+            while not copy.is_over():
+                actions = [(i, rng.choice(('left', 'right'))) for i in range(n) if rng.random() < 0.15]
+                [copy.handle_input(i, a) for i, a in actions]
+                copy.tick()
+                sim.step(actions)
+                self.assertEqual([((x, y), m) for x, y, m in zip(sim.x, sim.y, sim.movable)],
+                                 [((p.x, p.y), p.movable) for p in copy.player_list])
+            sim.rollout(0, 'left', depth=30, rng=rng)
+            self.assertEqual((bytes(game.occupancy.owners), game.occupancy.snapshot()[1:]), cells)
+            game.tick()  # plays on from the same grid
+
+    def test_reset(self):
+        """Test that a rollout leaves the game alone and
+        reset goes back to where the game is"""
+        game = new_game(2)
+        [game.tick() for _ in range(20)]
+        traces = [list(p.x_vec) for p in game.player_list]
+        sim = Lookahead(game)
+        sim.rollout(0, 'left', depth=40, rng=Random(0))
+        self.assertEqual([list(p.x_vec) for p in game.player_list], traces)
+        self.assertEqual(game.tick_count, 20)
+        sim.reset()
+        self.assertEqual((sim.x[0], sim.y[0], sim.ticks), (game.player_list[0].x, game.player_list[0].y, 0))
+
+    def test_rollout(self):
+        """Test that a rollout counts the ticks survived"""
+        game = new_game(2, size=100)
+        sim = Lookahead(game)
+        self.assertEqual(sim.rollout(0, None, depth=10), 11)    # still alive
+        self.assertEqual(sim.rollout(0, None, depth=100), 25)   # hits the top border
+
+    def test_bot_avoids_border(self):
+        """Test that a bot turns away from the border in time"""
+        game = new_game(height=60, controllers=[LookaheadBot(depth=20, seed=0)])
+        game.run_headless()
+        self.assertEqual([p.movable for p in game.player_list], [1, 0])
+        self.assertIn(0, [i for _, i, _ in game.input_log])
+
+    def test_bot_samples(self):
+        """Test that a bot given samples ignores the clock and
+        two seeded bots play the same round"""
+        logs = []
+        for budget in (0.0001, 10.0):
+            bot = LookaheadBot(depth=10, budget=budget, seed=1, samples=6)
+            game = new_game(2, size=100, controllers=[bot])
+            ticks = game.run_headless()
+            self.assertEqual(bot.rollouts, 6*ticks)
+            logs.append(game.input_log)
+        self.assertEqual(logs[0], logs[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
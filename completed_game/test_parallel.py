@@ -0,0 +1,117 @@
+#!../.venv/Scripts/python.exe
+import unittest
+from random import Random
+from pytron import Player, Game, TickStats
+from parallel import CollisionPool, speedup_test
+from fixtures import new_game
+
+
+class TestCollisionPool(unittest.TestCase):
+    # ============= setup =============
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = CollisionPool(workers=2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.close()
+
+    def play_both(self, serial, parallel, rng, ticks=None, turn_rate=0.1):
+        """Ticks both games with the same turns, checking
+        that the same players are frozen after every tick"""
+        n = len(serial.player_list)
+        while not serial.is_over() and serial.tick_count != ticks:
+            actions = [(i, rng.choice(('left', 'right'))) for i in range(n) if rng.random() < turn_rate]
+            for game in (serial, parallel):
+                [game.handle_input(i, a) for i, a in actions]
+                game.tick()
+            self.assertEqual([p.movable for p in serial.player_list],
+                             [p.movable for p in parallel.player_list])
+
+    # ============= tests =============
+    def test_matches_serial(self):
+        """Test that the pool freezes the same players as
+        checking on one process"""
+        for seed in range(10):
+            rng = Random(seed)
+            n, size = rng.choice((2, 3, 5, 8)), rng.choice((100, 200))
+            serial, parallel = new_game(n, size), new_game(n, size)
+            parallel.attach_pool(self.pool)
+            self.play_both(serial, parallel, rng)
+            self.assertTrue(parallel.is_over())
+
+    def test_segments_counted(self):
+        """Test that the segments the workers test are
+        added to the stats, the same as on one process"""
+        rng = Random(3)
+        serial, parallel = new_game(5, 200), new_game(5, 200)
+        serial.stats, parallel.stats = TickStats(), TickStats()
+        parallel.attach_pool(self.pool)
+        self.play_both(serial, parallel, rng)
+        self.assertGreater(sum(serial.stats.segment_history), 0)
+        self.assertEqual(list(parallel.stats.segment_history), list(serial.stats.segment_history))
+
+    def test_equidistant(self):
+        """Test that two heads meeting in the same point
+        both freeze when the pool checks them"""
+        game = Game(width=200, height=200)
+        a, b = Player(), Player()
+        game.add_player(a)
+        game.add_player(b)
+        a.set_starting_pos(0, -10)
+        a.heading = 90
+        b.set_starting_pos(-10, 0)
+        game.paused = False
+        game.attach_pool(self.pool)
+        game.run_headless(20)
+        self.assertEqual((a.movable, b.movable), (0, 0))
+        self.assertEqual(a.get_pos(), b.get_pos())
+
+    def test_restore(self):
+        """Test that traces cut back by a restore are
+        published again to the workers"""
+        rng = Random(1)
+        serial, parallel = new_game(4, 300), new_game(4, 300)
+        parallel.attach_pool(self.pool)
+        self.play_both(serial, parallel, rng, ticks=30)
+        states = serial.snapshot(), parallel.snapshot()
+        self.play_both(serial, parallel, rng, ticks=60)
+        serial.restore(states[0])
+        parallel.restore(states[1])
+        self.play_both(serial, parallel, rng, turn_rate=0.2)
+
+    def test_grow(self):
+        """Test that traces longer than the first shared
+        buffers are moved to bigger ones"""
+        serial, parallel = new_game(2, 10_000), new_game(2, 10_000)
+        parallel.attach_pool(self.pool)
+        for game in (serial, parallel):
+            for _ in range(700):  # spiral out, two vertices a turn
+                game.handle_input(0, 'left')
+                game.handle_input(0, 'right')
+        self.play_both(serial, parallel, Random(2), ticks=50)
+        self.assertGreater(self.pool.buffers[0][1], 1024)
+
+    def test_speedup_test(self):
+        """Test that the speedup test writes a record per player count"""
+        records = speedup_test((4, 8), ticks=20, workers=1)
+        self.assertEqual([r['players'] for r in records], [4, 8])
+        self.assertTrue(all(r['speedup'] > 0 for r in records))
+
+
+class TestClose(unittest.TestCase):
+    # ============= tests =============
+    def test_close(self):
+        """Test that closing the pool hands the
+        checks back to the game"""
+        game = new_game(2)
+        with CollisionPool(workers=1) as pool:
+            game.attach_pool(pool)
+            game.tick()
+        self.assertIsNone(game.pool)
+        self.assertEqual(pool.buffers, [])
+        game.tick()
+
+
+if __name__ == '__main__':
+    unittest.main()
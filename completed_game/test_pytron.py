@@ -1,22 +1,27 @@
 #!../.venv/Scripts/python.exe
 import unittest
-from unittest.mock import Mock
+from unittest.mock import Mock, patch
+from random import Random
+from os import devnull
+from os.path import abspath, dirname
+from time import sleep
+from timeit import default_timer as now
 from copy import copy
-from tkinter import Tk, Canvas
-from pytron import Player, Game
+from functools import partial
+from itertools import cycle
+from array import array
+from subprocess import run
+from importlib.util import find_spec
+import sys
+from pytron import Player, SpeedSchedule, Game, Lineage, SegmentGrid, OccupancyGrid, RunArray, FrameScheduler, TraceView, TickStats, TurtleRenderer
+from fixtures import new_game
 
 
 class TestPlayer(unittest.TestCase):
     # ============= setup =============
-    @classmethod
-    def setUpClass(cls):
-        cls.root = Tk()
-        cls.root.withdraw()
-        cls.canvas = Canvas(master=cls.root)
-
     def setUp(self):
-        # create a player with a canvas that will not show up
-        self.player = Player(canvas=self.canvas)
+        # create a headless player
+        self.player = Player()
 
     # ============= unit tests =============
     def test_initial_state(self):
@@ -41,8 +46,8 @@ class TestPlayer(unittest.TestCase):
         self.player.set_starting_pos()
         self.player.move()
         self.player.update_trace()
-        self.assertEqual(self.player.x_vec, [0.0, self.player.base_distance])
-        self.assertEqual(self.player.y_vec, [0.0, 0.0])
+        self.assertEqual(self.player.x_vec, array('i', [0, 200]))  # in units
+        self.assertEqual(self.player.y_vec, array('i', [0, 0]))
 
     def test_get_trace(self):
         """Test that the trace is accurate"""
@@ -52,21 +57,31 @@ class TestPlayer(unittest.TestCase):
         self.assertEqual(y_vec, [0])
         self.player.move()
         x_vec, y_vec = self.player.get_trace()
-        self.assertEqual(x_vec, [0, self.player.base_distance])
+        self.assertEqual(x_vec, [0, 200])
         self.assertEqual(y_vec, [0, 0])
 
+    def test_get_trace_shares_buffer(self):
+        """Test that the trace is a view of the
+        player's buffers rather than a copy"""
+        self.player.set_starting_pos()
+        self.player.move()
+        x_vec, y_vec = self.player.get_trace()
+        self.assertIs(x_vec.vertices, self.player.x_vec)
+        self.assertIs(y_vec.vertices, self.player.y_vec)
+        self.assertEqual(x_vec.head, self.player.base_distance*self.player.units)
+
     def test_turn_right(self):
         """Test that turn right
         works as expected"""
-        self.player.turn_right()          # turn 90 deg right
-        h = self.player.cursor.heading()  # angle in degrees
+        self.player.turn_right()   # turn 90 deg right
+        h = self.player.heading    # angle in degrees
         self.assertEqual(h, 270)          # test to ensure point south
 
     def test_turn_left(self):
         """Test that turn left
         works as expected"""
-        self.player.turn_left()           # turn 90 deg left
-        h = self.player.cursor.heading()  # angle in degrees
+        self.player.turn_left()    # turn 90 deg left
+        h = self.player.heading    # angle in degrees
         self.assertEqual(h, 90)           # test to ensure point north
 
     def test_move(self):
@@ -89,6 +104,45 @@ class TestPlayer(unittest.TestCase):
         dpl = self.player.distance_per_loop
         self.assertEqual(dpl, 1.5*self.player.base_distance)
 
+    def test_speed_schedule(self):
+        """Test that the speed only changes at the thresholds
+        of a configured schedule"""
+        p = Player(speed_schedule=SpeedSchedule(step=10, multipliers=[1, 2, 4]))
+        speeds = []
+        for _ in range(20):
+            p.update()
+            speeds.append(p.distance_per_loop)
+        self.assertEqual(speeds[:7], [2.0, 2.0, 2.0, 2.0, 4.0, 4.0, 4.0])
+        self.assertEqual(set(speeds[8:]), {8.0})  # the last multiplier holds
+        p.score = 0  # e.g. a restored snapshot
+        p.update()
+        self.assertEqual(p.distance_per_loop, 2.0)
+
+    def test_update(self):
+        """Test that update is the same as update_score,
+        update_dist_per_loop and move"""
+        other = Player()
+        for k in range(2000):
+            if k == 1500:
+                self.player.freeze()
+                other.freeze()
+            self.player.update()
+            other.update_score()
+            other.update_dist_per_loop()
+            other.move()
+            self.assertEqual((self.player.x, self.player.score, self.player.distance_per_loop),
+                             (other.x, other.score, other.distance_per_loop))
+
+    def test_exact_positions(self):
+        """Test that positions stay exact at speeds that
+        aren't binary fractions"""
+        self.player.speed_schedule = SpeedSchedule(multipliers=(1.15,))
+        self.player.set_starting_pos(0.1, 0.0)
+        for _ in range(1000):
+            self.player.update()
+        self.assertEqual(self.player.x, 10 + 1000*230)
+        self.assertEqual(self.player.get_pos(), (2300.1, 0.0))
+
     def test_set_starting_position(self):
         """Test that the starting point is accurately recorded"""
         self.player.set_starting_pos(-5.0, 0.0)
@@ -103,7 +157,7 @@ class TestPlayer(unittest.TestCase):
         self.player.turn_left()  # point north
         self.player.move()       # go forward by player.base_speed
         x, y = self.player.get_pos()      # x should equal to y
-        h = self.player.cursor.heading()  # heading should be 90
+        h = self.player.heading           # heading should be 90
         self.assertEqual(x, self.player.base_distance)
         self.assertEqual(x, y)
         self.assertEqual(h, 90)
@@ -111,16 +165,10 @@ class TestPlayer(unittest.TestCase):
 
 class TestGame(unittest.TestCase):
     # ============= setup =============
-    @classmethod
-    def setUpClass(cls):
-        cls.root = Tk()
-        cls.root.withdraw()
-        cls.canvas = Canvas(master=cls.root)
-
     def setUp(self):
-        # create a player with a canvas that will not show up
-        self.player = Player(canvas=self.canvas)
-        self.game = Game(canvas=self.canvas)
+        # create a headless player and game
+        self.player = Player()
+        self.game = Game()
 
     # ============= tests =============
     def test_initial_state(self):
@@ -147,11 +195,8 @@ class TestGame(unittest.TestCase):
         self.assertTrue(self.game.paused)
 
     def test_border_collision_detected(self):
-        # create the screen mock methods
-        screen = self.game.screen
-        screen.window_width = Mock()
-        screen.window_width.return_value = 100
-        screen.window_height = screen.window_width
+        # use a 100 x 100 playfield
+        self.game = Game(width=100, height=100)
         # add the player to the game
         pos = self.player.get_pos
         self.game.add_player(self.player)
@@ -196,6 +241,17 @@ class TestGame(unittest.TestCase):
         self.player.set_starting_pos(0, -51)
         self.assertTrue(self.game.boarder_collision_detected(*pos()))
 
+    def test_check_for_border_collisions(self):
+        """Test that every player out of bounds is frozen"""
+        self.game.set_bounds(100, 60)
+        positions = [(0, 0), (50, 0), (0, -30), (49.99, 29.99), (-60, 40)]
+        for x, y in positions:
+            p = Player()
+            p.set_starting_pos(x, y)
+            self.game.add_player(p)
+        self.game.check_for_border_collisions()
+        self.assertEqual([p.movable for p in self.game.player_list], [1, 0, 0, 1, 0])
+
     def test_line_intersection_detected(self):
         # =========== vectors that do not intersect ===========
         x_vec, x_last_vec = [-1, 1], [0, 0]
@@ -284,6 +340,846 @@ class TestGame(unittest.TestCase):
         self.assertEqual(player1.movable, 1)
         self.assertEqual(player2.movable, 0)
 
+    def test_handle_input(self):
+        """Test that key presses are applied and logged
+        with the number of ticks played before them"""
+        self.game.add_player(self.player)
+        self.game.setup_players()
+        self.game.handle_input(None, 'pause')
+        self.game.tick()
+        self.game.handle_input(0, 'left')
+        self.game.handle_input(0, 'right')
+        self.assertFalse(self.game.paused)
+        self.assertEqual(self.player.heading, 90)
+        self.assertEqual(len(self.player.x_vec), 3)
+        self.assertEqual(self.game.input_log, [(0, None, 'pause'), (1, 0, 'left'), (1, 0, 'right')])
+
+    def test_press_buffered(self):
+        """Test that key presses wait for the start of the
+        next tick and are applied in the order they came"""
+        self.game.stats = TickStats()
+        self.game.add_player(self.player)
+        self.game.setup_players()
+        self.game.press(None, 'pause')
+        self.game.press(0, 'left')
+        self.assertTrue(self.game.paused)
+        self.assertEqual(self.player.heading, 90)
+        self.game.tick()
+        self.assertEqual(self.game.pending, [])
+        self.assertFalse(self.game.paused)
+        self.assertEqual(self.player.heading, 180)
+        self.assertEqual(self.player.get_pos(), (-Player.base_distance, 0))  # turned before moving
+        self.assertEqual(self.game.input_log, [(0, None, 'pause'), (0, 0, 'left')])
+        self.assertEqual(len(self.game.stats.history['input']), 2)
+
+    def test_input_latency(self):
+        """Test that presses made while run_loop waits and
+        the ticks run slow are applied within a frame"""
+        self.game = Game(width=200, height=400, stats=TickStats())
+        [self.game.add_player(Player()) for _ in range(2)]
+        self.game.setup_players()
+        self.game.toggle_pause()
+        rng, turns, pressed = Random(0), cycle(('left', 'right')), [-1]
+
+        def poll():  # key presses come in while the loop waits, a zig zag of one turn a tick at most
+            if (pressed[0] != self.game.tick_count) and (rng.random() < 0.1):
+                pressed[0] = self.game.tick_count
+                self.game.press(0, next(turns))
+
+        self.game.renderer = Mock(poll=poll)
+        self.game.phases += (('load', partial(sleep, 0.01)),)  # a quarter of the budget
+        scheduler = FrameScheduler(tick_rate=25, render_rate=25)
+        self.game.run_loop(scheduler)
+        latency = self.game.stats.history['input']
+        self.assertGreater(len(latency), 10)
+        self.assertLessEqual(max(latency), scheduler.render_dt)
+
+    def test_wait_paused(self):
+        """Test that a paused game handles key presses once
+        per wait instead of every input_poll seconds"""
+        self.game.add_player(Player())
+        self.game.add_player(Player())
+        self.game.setup_players()
+        self.game.renderer = Mock()
+        self.game.wait(0.02)
+        self.assertEqual(self.game.renderer.poll.call_count, 1)
+        self.game.toggle_pause()
+        self.game.wait(0.02)
+        self.assertGreater(self.game.renderer.poll.call_count, 2)
+
+    def test_game_over_sleeps(self):
+        """Test that the play again prompt sleeps between
+        polls rather than spinning on the renderer"""
+        game = new_game(paused=True)
+        game.run_headless()
+        polls = []
+
+        def poll():
+            polls.append(now())
+            if len(polls) == 3:
+                game.play_again_false()
+
+        game.renderer = Mock(poll=poll)
+        start = now()
+        game.game_over()
+        self.assertIs(game.play_again, False)
+        self.assertEqual(len(polls), 3)
+        self.assertGreaterEqual(polls[-1] - start, 2/FrameScheduler.render_rate)
+
+    def play_logged_round(self, seed):
+        """Plays a round with random key presses and returns the game"""
+        rng = Random(seed)
+        game = Game(width=300, height=300)
+        [game.add_player(Player()) for _ in range(3)]
+        game.setup_players()
+        game.handle_input(None, 'pause')
+        while not game.is_over():
+            for i in range(3):
+                if rng.random() < 0.1:
+                    game.handle_input(i, rng.choice(['left', 'right']))
+            if rng.random() < 0.05:
+                game.handle_input(None, 'pause')
+                game.handle_input(None, 'pause')
+            game.tick()
+        return game
+
+    def test_replay(self):
+        """Test that replaying the key presses gives the same round"""
+        for seed in range(20):
+            played = self.play_logged_round(seed)
+            replayed = new_game(3, paused=True)
+            replayed.replay(played.input_log)
+            self.assertEqual(replayed.tick_count, played.tick_count)
+            for p, q in zip(played.player_list, replayed.player_list):
+                self.assertEqual(p.x_vec, q.x_vec)
+                self.assertEqual(p.y_vec, q.y_vec)
+                self.assertEqual((p.movable, p.score, p.get_pos()), (q.movable, q.score, q.get_pos()))
+
+    def test_replay_until_tick(self):
+        """Test that a replay can stop at a tick and be played on"""
+        played = self.play_logged_round(0)
+        replayed = new_game(3, paused=True)
+        replayed.replay(played.input_log, until_tick=played.tick_count//2)
+        self.assertEqual(replayed.tick_count, played.tick_count//2)
+        replayed.replay(played.input_log)
+        self.assertEqual([p.get_pos() for p in replayed.player_list],
+                         [p.get_pos() for p in played.player_list])
+
+    def test_tick(self):
+        """Test that a tick moves every player"""
+        self.game = Game(width=300, height=300)
+        player1, player2 = Player(), Player()
+        self.game.add_player(player1)
+        self.game.add_player(player2)
+        self.game.setup_players()
+        self.game.tick()
+        self.assertEqual(player1.get_pos(), (50, Player.base_distance))
+        self.assertEqual(player2.get_pos(), (-50, Player.base_distance))
+
+    def test_run_headless(self):
+        """Test that a headless round ends when the
+        players run into the top of the playfield"""
+        self.game = Game(width=200, height=200)
+        player1, player2 = Player(), Player()
+        self.game.add_player(player1)
+        self.game.add_player(player2)
+        self.game.setup_players()
+        ticks = self.game.run_headless()
+        self.assertEqual(ticks, 50)  # 2.0 per tick up to y == 100
+        self.assertEqual(self.game.num_players_movable(), 0)
+        self.assertEqual(self.game.run_headless(), 0)
+
+    def test_check_for_line_intersections_indexed(self):
+        """Test that segments closed on earlier ticks
+        are still found through the segment grid"""
+        player = copy(self.player)
+        player.get_trace = Mock()
+        self.game.add_player(player)
+        # ==== a long spiral that never crosses itself ====
+        x_vec, y_vec = [0, 100, 100, 0, 0], [0, 0, 100, 100, 50]
+        player.get_trace.return_value = (x_vec, y_vec)
+        self.game.check_for_line_intersections()
+        self.assertEqual(player.movable, 1)
+        self.assertEqual(self.game.segment_grid.counts[0], 3)
+        # ==== tail crosses the first segment ====
+        player.get_trace.return_value = ([*x_vec, 50], [*y_vec, 50])
+        self.game.check_for_line_intersections()
+        self.assertEqual(player.movable, 1)
+        player.get_trace.return_value = ([*x_vec, 50, 50], [*y_vec, 50, -1])
+        self.game.check_for_line_intersections()
+        self.assertEqual(player.movable, 0)
+
+    def test_swept_tail(self):
+        """Test that only the distance moved since the
+        last check is returned while the tail extends"""
+        x_vec, y_vec = [0, 10, 10], [0, 0, 5]
+        self.assertEqual(self.game.swept_tail(0, x_vec, y_vec), ([10, 10], [0, 5]))
+        self.assertEqual(self.game.swept_tail(0, x_vec, y_vec), ([], []))
+        self.assertEqual(self.game.swept_tail(0, [0, 10, 10], [0, 0, 8]), ([10, 10], [5, 8]))
+        # a turn starts a new tail
+        self.assertEqual(self.game.swept_tail(0, [0, 10, 10, 9], [0, 0, 8, 8]), ([10, 9], [8, 8]))
+        # moving backwards along the tail is checked in full
+        self.assertEqual(self.game.swept_tail(0, [0, 10, 10, 9.5], [0, 0, 8, 8]), ([10, 9.5], [8, 8]))
+        # a full check every tick when turned off
+        self.game.incremental_collisions = False
+        self.assertEqual(self.game.swept_tail(0, [0, 10, 10, 9], [0, 0, 8, 8]), ([10, 9], [8, 8]))
+
+    def test_incremental_collisions_match_full(self):
+        """Test that checking only the swept part of each tail
+        freezes the same players as checking every tail in full"""
+        rng = Random(1)
+        for _ in range(40):
+            n = rng.randint(2, 5)
+            games = [Game(width=300, height=300), Game(width=300, height=300)]
+            games[1].incremental_collisions = False
+            for game in games:
+                [game.add_player(Player()) for _ in range(n)]
+                game.setup_players()
+            while not games[0].is_over():
+                turns = [(rng.random() < 0.1, rng.random() < 0.5) for _ in range(n)]
+                for game in games:
+                    for (turn, left), p in zip(turns, game.player_list):
+                        if turn:
+                            p.turn_left() if left else p.turn_right()
+                    game.tick()
+                self.assertEqual([p.movable for p in games[0].player_list],
+                                 [p.movable for p in games[1].player_list])
+
+
+@unittest.skipIf(find_spec('numpy') is None, "requires numpy")
+class TestLineIntersectionNp(unittest.TestCase):
+    """Compares line_intersection_detected_np against the
+    reference line_intersection_detected"""
+    # ============= setup =============
+    def setUp(self):
+        self.game = Game()
+        self.rng = Random(0)
+
+    def random_walk(self, n, step=6):
+        """Returns an axis aligned trace of n points with
+        zero length and half unit moves mixed in"""
+        rng = self.rng
+        x, y = float(rng.randint(-5, 5)), float(rng.randint(-5, 5))
+        x_vec, y_vec = [x], [y]
+        for _ in range(n - 1):
+            d = rng.choice([-1, 1])*rng.randint(0, step)*rng.choice([0.5, 1])
+            if rng.random() < 0.5:
+                x += d
+            else:
+                y += d
+            x_vec.append(x)
+            y_vec.append(y)
+        return x_vec, y_vec
+
+    def assertSameIntersection(self, x_vec, y_vec, x_last_vec, y_last_vec):
+        expected = self.game.line_intersection_detected(x_vec, y_vec, x_last_vec, y_last_vec)
+        result = self.game.line_intersection_detected_np(x_vec, y_vec, x_last_vec, y_last_vec)
+        self.assertEqual(result, expected, (x_vec, y_vec, x_last_vec, y_last_vec))
+
+    # ============= tests =============
+    def test_empty_trace(self):
+        self.assertIsNone(self.game.line_intersection_detected_np([], [], [0, 0], [0, 1]))
+
+    def test_random_axis_aligned_traces(self):
+        for _ in range(2000):
+            x_vec, y_vec = self.random_walk(self.rng.randint(1, 30))
+            x_last_vec, y_last_vec = self.random_walk(self.rng.randint(1, 2))
+            self.assertSameIntersection(x_vec, y_vec, x_last_vec, y_last_vec)
+
+    def test_random_traces_against_own_tail(self):
+        """Test the self check made by check_for_line_intersections"""
+        for _ in range(2000):
+            x_vec, y_vec = self.random_walk(self.rng.randint(1, 30), step=3)
+            self.assertSameIntersection(x_vec[:-3], y_vec[:-3], x_vec[-2:], y_vec[-2:])
+
+    def test_random_diagonal_traces(self):
+        """Test that the vectors agree even on input the
+        game never produces"""
+        rng = self.rng
+        for _ in range(1000):
+            n = rng.randint(1, 20)
+            x_vec = [rng.choice([rng.randint(-3, 3), rng.uniform(-3, 3)]) for _ in range(n)]
+            y_vec = [rng.choice([rng.randint(-3, 3), rng.uniform(-3, 3)]) for _ in range(n)]
+            x_last_vec = [rng.randint(-3, 3) for _ in range(2)]
+            y_last_vec = [rng.randint(-3, 3) for _ in range(2)]
+            self.assertSameIntersection(x_vec, y_vec, x_last_vec, y_last_vec)
+
+    def test_trace_views(self):
+        """Test that player traces can be passed in directly"""
+        player = Player()
+        player.set_starting_pos(-10, 0)
+        player.move()
+        player.turn_left()
+        player.move()
+        x_vec, y_vec = player.get_trace()
+        self.assertSameIntersection(x_vec, y_vec, [-9, -9], [-5, 5])
+
+
+class TestSegmentGrid(unittest.TestCase):
+    # ============= setup =============
+    def setUp(self):
+        self.grid = SegmentGrid(cell_size=10)
+
+    # ============= tests =============
+    def test_sync_skips_open_segment(self):
+        """Test that only closed segments are indexed"""
+        self.grid.sync(0, [0, 20, 20], [0, 0, 5])
+        self.assertEqual(self.grid.counts[0], 1)
+        self.grid.sync(0, [0, 20, 20, 40], [0, 0, 5, 5])
+        self.assertEqual(self.grid.counts[0], 2)
+
+    def test_sync_after_reset(self):
+        """Test that a shorter trace replaces the old segments"""
+        self.grid.sync(0, [0, 20, 20, 40], [0, 0, 5, 5])
+        self.grid.sync(0, [0, 0, 5], [50, 60, 60])
+        self.assertEqual(self.grid.counts[0], 1)
+        self.assertEqual(self.grid.query([15, 25], [0, 0]), {})
+
+    def test_query(self):
+        """Test that only segments near the tail are returned"""
+        self.grid.sync(0, [0, 20, 20, 40, 40], [0, 0, 50, 50, 60])
+        self.grid.sync(1, [-30, -30, -10], [0, 30, 30])
+        self.assertEqual(self.grid.query([15, 15], [-5, 5]), {0: [0]})
+        self.assertEqual(self.grid.query([-40, 30], [30, 30]), {0: [1], 1: [0]})
+        self.assertEqual(self.grid.query([100, 110], [0, 0]), {})
+
+    def test_truncate(self):
+        """Test that cut back segments leave their cells and
+        that growing back doesn't add them twice"""
+        x_vec, y_vec = [0, 20, 20, 40, 40], [0, 0, 50, 50, 60]
+        self.grid.sync(1, [-30, -30, -10], [0, 30, 30])
+        self.grid.sync(0, x_vec, y_vec)
+        entries = sum(len(e) for e in self.grid.cells.values())
+        for _ in range(10):
+            self.grid.truncate(0, 1)
+            self.assertEqual(self.grid.query([-40, 30], [30, 30]), {1: [0]})
+            self.grid.sync(0, x_vec, y_vec)
+        self.assertEqual(sum(len(e) for e in self.grid.cells.values()), entries)
+        self.grid.remove_owner(0)
+        self.assertEqual(set(self.grid.query([-100, 100], [-100, 100])), {1})
+
+
+class TestTraceView(unittest.TestCase):
+    # ============= setup =============
+    def setUp(self):
+        self.view = TraceView(array('d', [0, 1, 2]), 3)
+
+    # ============= tests =============
+    def test_len(self):
+        self.assertEqual(len(self.view), 4)
+        self.assertEqual(len(TraceView(array('d', [0, 1, 2]))), 3)
+
+    def test_getitem(self):
+        self.assertEqual(self.view[0], 0)
+        self.assertEqual(self.view[3], 3)
+        self.assertEqual(self.view[-1], 3)
+        self.assertEqual(self.view[-4], 0)
+        with self.assertRaises(IndexError):
+            self.view[4]
+
+    def test_slices(self):
+        """Test that slices match slicing a list"""
+        items = [0, 1, 2, 3]
+        for s in [slice(-2, None), slice(None, -3), slice(1, 3), slice(3, 4),
+                  slice(2, None), slice(5, 6), slice(None, None, 2), slice(-9, 9)]:
+            self.assertEqual(self.view[s], items[s])
+
+    def test_eq(self):
+        self.assertEqual(self.view, [0, 1, 2, 3])
+        self.assertNotEqual(self.view, [0, 1, 2])
+
+
+class TestTickStats(unittest.TestCase):
+    # ============= setup =============
+    def setUp(self):
+        self.stats = TickStats(budget=0.01, window=3)
+
+    # ============= tests =============
+    def test_game_records_phases(self):
+        """Test that an instrumented game records every
+        phase of each tick and the segments tested"""
+        game = Game(width=200, height=200, stats=self.stats)
+        game.add_player(Player())
+        game.add_player(Player())
+        game.setup_players()
+        game.player_list[0].turn_left()  # head for player 2's line
+        self.stats.path = devnull
+        game.run_headless()
+        self.assertEqual(self.stats.ticks, game.tick_count)
+        self.assertEqual(set(self.stats.last), {'move', 'border', 'lines', 'tick'})
+        self.assertEqual(len(self.stats.history['tick']), 3)
+        self.assertGreater(sum(self.stats.segment_history), 0)
+
+    def test_occupancy_tests_no_segments(self):
+        """Test that the report leaves the segments out when
+        the occupancy grid checks the lines"""
+        game = new_game(collisions='occupancy')
+        game.stats = self.stats
+        game.player_list[0].turn_left()
+        self.stats.path = devnull
+        game.run_headless(5)
+        self.assertEqual(self.stats.ticks, 5)
+        self.assertEqual(len(self.stats.segment_history), 0)
+        self.assertNotIn('segments', self.stats.report())
+
+    def test_overruns(self):
+        self.stats.timed_tick([('slow', lambda: sleep(0.02)), ('fast', lambda: None)])
+        self.stats.timed_tick([('fast', lambda: None)])
+        self.assertEqual(self.stats.ticks, 2)
+        self.assertEqual(self.stats.overruns, 1)
+
+    def test_histogram(self):
+        for seconds in [0.00005, 0.0015, 1.0]:
+            self.stats.record('lines', seconds)
+        counts = self.stats.histogram('lines')
+        self.assertEqual(counts[0], 1)   # below the first edge
+        self.assertEqual(counts[4], 1)   # between 1ms and 2ms
+        self.assertEqual(counts[-1], 1)  # above the last edge
+        self.assertIn('lines', self.stats.report())
+
+
+class TestTurtleRenderer(unittest.TestCase):
+    # ============= setup =============
+    def setUp(self):
+        # a renderer with a mock screen so no window is needed
+        self.renderer = TurtleRenderer.__new__(TurtleRenderer)
+        self.renderer.screen = Mock()
+        self.renderer.screen.window_width.return_value = 300
+        self.renderer.screen.window_height.return_value = 200
+        self.game = Game()
+
+    # ============= tests =============
+    def test_attach(self):
+        """Test that the bounds are read once and the
+        game's keys are bound"""
+        self.game.attach_renderer(self.renderer)
+        self.assertEqual((self.game.width, self.game.height), (300, 200))
+        fun, key = self.renderer.screen.onkey.call_args[0]
+        self.assertEqual(key, 'space')
+        fun()  # press space
+        self.assertTrue(self.game.paused)  # buffered until the next tick
+        self.game.apply_pending()
+        self.assertFalse(self.game.paused)
+        window = self.renderer.screen.getcanvas.return_value.winfo_toplevel.return_value
+        self.assertEqual(window.bind.call_args[0][0], '<Configure>')
+
+    def test_detach(self):
+        """Test that detaching only drops the renderer's own
+        <Configure> binding so the screen lets go of the game"""
+        window = self.renderer.screen.getcanvas.return_value.winfo_toplevel.return_value
+        window.bind.side_effect = lambda sequence, func=None, add=None: 'resize1' if func else \
+            'if {"[turtle1 %W]" == "break"} break\nif {"[resize1 %W]" == "break"} break\n'
+        self.game.attach_renderer(self.renderer)
+        self.renderer.detach()
+        window.bind.assert_called_with('<Configure>', 'if {"[turtle1 %W]" == "break"} break\n')
+        window.deletecommand.assert_called_once_with('resize1')
+        self.renderer.detach()  # only once
+        window.deletecommand.assert_called_once()
+
+    def test_resize(self):
+        """Test that the bounds follow a <Configure> event"""
+        self.game.attach_renderer(self.renderer)
+        on_configure = self.renderer.screen.getcanvas.return_value.winfo_toplevel.return_value.bind.call_args[0][1]
+        self.renderer.screen.window_width.return_value = 500
+        on_configure(Mock())
+        self.assertEqual(self.game.half_width, 250)
+        self.assertEqual(self.renderer.screen.window_width.call_count, 2)
+
+    def test_resize_after_setup(self):
+        """Test that the bounds stay put once the players
+        are set up, as their starting positions depend on them"""
+        self.game.attach_renderer(self.renderer)
+        on_configure = self.renderer.screen.getcanvas.return_value.winfo_toplevel.return_value.bind.call_args[0][1]
+        [self.game.add_player(Player()) for _ in range(2)]
+        self.game.setup_players()
+        self.renderer.screen.window_width.return_value = 500
+        on_configure(Mock())
+        self.assertEqual((self.game.width, self.game.height), (300, 200))
+
+    def canvas(self):
+        """Sets up a real renderer on the mock screen and
+        returns the mock canvas it draws on"""
+        self.renderer.screen.turtles.return_value = [Mock()]
+        with patch('turtle.TurtleScreen', return_value=self.renderer.screen):
+            self.renderer.__init__(canvas=Mock())
+        self.renderer.screen.xscale = self.renderer.screen.yscale = 1.0
+        canvas = self.renderer.screen.getcanvas.return_value
+        canvas.create_line.side_effect = lambda *args, **kwargs: Mock()
+        self.game.attach_renderer(self.renderer)
+        return canvas
+
+    def test_render_extends_trail(self):
+        """Test that a trail is drawn as one line item
+        through its vertices and the head"""
+        canvas = self.canvas()
+        p = Player()
+        p.set_starting_pos(0, 0)
+        p.heading = 90
+        self.game.add_player(p)
+        p.move()
+        p.turn_left()
+        p.move()
+        self.game.render()
+        item = self.renderer.trails[0][0]
+        self.assertEqual(canvas.coords.call_args_list[0][0], (item, 0.0, -0.0, 0.0, -2.0, -2.0, -2.0))
+        self.assertEqual(self.renderer.frames, 1)
+
+    def test_render_skips_unchanged(self):
+        """Test that nothing is redrawn when no player moved"""
+        canvas = self.canvas()
+        [self.game.add_player(Player()) for _ in range(2)]
+        self.game.setup_players()
+        self.game.render()
+        canvas.coords.reset_mock()
+        self.game.render()
+        canvas.coords.assert_not_called()
+        self.assertEqual(self.renderer.frames, 1)
+        self.assertEqual(canvas.update.call_count, 2)  # events are still handled
+
+    def test_render_cost_is_bounded(self):
+        """Test that a frame only updates items of bounded size
+        however long the trace gets"""
+        canvas = self.canvas()
+        p = Player()
+        p.set_starting_pos(0, 0)
+        self.game.add_player(p)
+        for k in range(10_000):  # a long zig zag
+            p.turn_left() if k % 4 in (0, 1) else p.turn_right()
+            p.move()
+        self.game.render()
+        self.assertEqual(len(self.renderer.trails[0]), -(-10_000//(TurtleRenderer.chunk_vertices - 1)))
+        p.turn_left()
+        p.move()
+        canvas.coords.reset_mock()
+        self.game.render()
+        sizes = [len(args) - 1 for args, kwargs in canvas.coords.call_args_list]
+        self.assertTrue(all(size <= 2*TurtleRenderer.chunk_vertices + 2 for size in sizes))
+
+    def test_no_undo_history(self):
+        """Test that the turtles keep no undo history and
+        messages reuse one pen"""
+        self.canvas()
+        self.renderer.screen.turtles.return_value[0].setundobuffer.assert_called_once_with(None)
+        with patch('turtle.RawTurtle') as raw_turtle:
+            self.renderer.write("Play Again? [y/n]")
+            self.renderer.write("Play Again? [y/n]")
+        raw_turtle.assert_called_once()
+        pen = raw_turtle.return_value
+        pen.setundobuffer.assert_called_once_with(None)
+        self.assertEqual(pen.clear.call_count, 2)
+
+    def test_render_reset_trace(self):
+        """Test that a reset trace deletes its line items"""
+        canvas = self.canvas()
+        [self.game.add_player(Player()) for _ in range(2)]
+        self.game.setup_players()
+        self.game.render()
+        items = list(self.renderer.trails[0])
+        self.game.player_list[0].reset_trace()
+        self.game.render()
+        self.assertEqual([args[0] for args, kwargs in canvas.delete.call_args_list], items)
+        self.game.player_list[0].set_starting_pos(10, 10)
+        self.game.render()
+        self.assertEqual(self.renderer.drawn[0], 1)
+        self.assertEqual(len(self.renderer.trails[0]), 1)
+
+
+class TestOccupancyGrid(unittest.TestCase):
+    # ============= setup =============
+    def setUp(self):
+        self.grid = OccupancyGrid(100, 100, 1.0)
+
+    # ============= tests =============
+    def test_path(self):
+        """Test that a path runs along x then y, start excluded"""
+        self.assertEqual(self.grid.path((0, 0), (2, 0)), [(1, 0), (2, 0)])
+        self.assertEqual(self.grid.path((0, 0), (0, -2)), [(0, -1), (0, -2)])
+        self.assertEqual(self.grid.path((0, 0), (1, 1)), [(1, 0), (1, 1)])
+        self.assertEqual(self.grid.path((3, 3), (3, 3)), [])
+
+    def test_sweep(self):
+        """Test that the first sweep marks the trace and the
+        next ones return the cells the head moved into"""
+        self.assertEqual(self.grid.sweep(0, [0.5, 0.5], [0.5, 3.5]), [])
+        self.assertEqual([self.grid.owner((0, y)) for y in range(5)], [0, 0, 0, 0, None])
+        self.assertEqual(self.grid.sweep(0, [0.5, 0.5], [0.5, 5.5]), [(0, 4), (0, 5)])
+
+    def test_mark(self):
+        """Test that cells keep their first owner and
+        cells off the grid are ignored"""
+        self.grid.mark(1, (2, 2))
+        self.grid.mark(0, (2, 2))
+        self.grid.mark(0, (500, 0))
+        self.assertEqual(self.grid.owner((2, 2)), 1)
+        self.assertIsNone(self.grid.owner((500, 0)))
+
+    def test_reset(self):
+        """Test that a reset trace gives its cells back"""
+        self.grid.sweep(0, [0.5, 0.5, 2.5], [0.5, 3.5, 3.5])
+        self.grid.sweep(0, [10.5], [10.5])
+        self.assertIsNone(self.grid.owner((0, 2)))
+        self.assertEqual(self.grid.owner((10, 10)), 0)
+
+    def test_journal_runs(self):
+        """Test that the cells marked along straight lines
+        are journaled as one run per line"""
+        self.grid.sweep(0, [0.5], [0.5])
+        for y in range(1, 40):  # one cell a tick
+            [self.grid.mark(0, cell) for cell in self.grid.sweep(0, [0.5, 0.5], [0.5, y + 0.5])]
+        [self.grid.mark(0, cell) for cell in self.grid.sweep(0, [0.5, 0.5, -20.5], [0.5, 39.5, 39.5])]
+        journal = self.grid.journals[0]
+        self.assertEqual(len(journal), 61)
+        self.assertEqual(len(journal.ends), 2)
+        self.assertEqual(list(journal.items(59)), [self.grid.index((-20, 39)), self.grid.index((-21, 39))])
+
+
+class TestRunArray(unittest.TestCase):
+    # ============= tests =============
+    def test_matches_list(self):
+        """Test that appending, reading and truncating
+        give the same items as a list"""
+        rng = Random(0)
+        for _ in range(200):
+            items, runs = [], RunArray()
+            for _ in range(50):
+                if rng.random() < 0.8:
+                    value = items[-1] + rng.choice((0, 1, -1, 5)) if items else rng.randrange(100)
+                    items.append(value)
+                    runs.append(value)
+                else:
+                    length = rng.randrange(len(items) + 2)
+                    del items[length:]
+                    runs.truncate(length)
+                start = rng.randrange(len(items) + 2)
+                self.assertEqual(list(runs.items(start)), items[start:])
+                self.assertEqual(len(runs), len(items))
+
+
+class TestCellCollisions(unittest.TestCase):
+    # ============= tests =============
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            Game(collisions='pixels')
+
+    def test_own_trail(self):
+        """Test that running into your own trail freezes you"""
+        game = new_game(collisions='occupancy')
+        [game.tick() for _ in range(5)]
+        for _ in range(3):  # box back into the trail
+            game.handle_input(0, 'left')
+            [game.tick() for _ in range(2)]
+        self.assertEqual([p.movable for p in game.player_list], [0, 1])
+
+    def test_crossing(self):
+        """Test that the player crossing another's trail freezes"""
+        game = new_game(size=200, collisions='occupancy')
+        game.tick()
+        game.handle_input(1, 'right')
+        while game.player_list[1].movable and not game.is_over():
+            game.tick()
+        self.assertEqual([p.movable for p in game.player_list], [1, 0])
+        self.assertEqual(game.player_list[1].get_pos(), (34.66, 2.0))  # same as the exact checks
+
+    def test_matches_segments(self):
+        """Test that the grid and the exact checks agree on
+        when players die, to within a tick, in most rounds"""
+        agree = 0
+        for seed in range(40):
+            rng = Random(seed)
+            n = rng.choice((2, 3, 4))
+            script = [[(i, rng.choice(('left', 'right'))) for i in range(n) if rng.random() < 0.06]
+                      for _ in range(2000)]
+            deaths = []
+            for collisions in ('segments', 'occupancy'):
+                game = new_game(n, collisions=collisions)
+                died = [None for _ in range(n)]
+                while not game.is_over():
+                    [game.handle_input(i, a) for i, a in script[game.tick_count]]
+                    game.tick()
+                    died = [d or (None if p.movable else game.tick_count) for d, p in zip(died, game.player_list)]
+                deaths.append(died)
+            agree += all((a is None) == (b is None) and (a is None or abs(a - b) <= 1) for a, b in zip(*deaths))
+        self.assertGreaterEqual(agree, 36)
+
+
+class TestLineage(unittest.TestCase):
+    # ============= tests =============
+    def test_intact(self):
+        """Test that lengths up to each cut stay intact"""
+        lineage = Lineage()
+        self.assertTrue(lineage.intact(0, 10))  # never cut
+        lineage.cut(5)
+        self.assertTrue(lineage.intact(0, 5))
+        self.assertFalse(lineage.intact(0, 6))
+        branch = lineage.current
+        lineage.cut(3)
+        self.assertTrue(lineage.intact(branch, 3))
+        self.assertFalse(lineage.intact(branch, 4))
+
+    def test_repeated_cuts(self):
+        """Test that cutting back to the same length again
+        and again doesn't lengthen the walk"""
+        lineage = Lineage()
+        for _ in range(100):
+            lineage.cut(7)
+        self.assertEqual(list(lineage.lengths), [7])
+        self.assertTrue(lineage.intact(0, 7))
+        self.assertFalse(lineage.intact(0, 8))
+
+    def test_bounded(self):
+        """Test that playing on and cutting back again and
+        again only holds the cuts that can still decide"""
+        lineage = Lineage()
+        for length in range(1000):
+            branch = lineage.current
+            lineage.cut(length)
+            lineage.cut(length + 1)
+            self.assertTrue(lineage.intact(branch, length))
+            self.assertFalse(lineage.intact(branch, length + 1))
+        self.assertEqual(len(lineage.lengths), 1001)  # one per length, not per cut
+        lineage.cut(0)
+        self.assertEqual(list(lineage.lengths), [0])
+
+
+class TestSnapshot(unittest.TestCase):
+    # ============= setup =============
+    def play(self, game, ticks, turns=()):
+        for _ in range(ticks):
+            for i, action in turns:
+                game.handle_input(i, action)
+            game.tick()
+            turns = ()
+
+    def state(self, game):
+        return (game.tick_count, game.paused, list(game.input_log),
+                [(p.x, p.y, p.heading, p.score, p.movable, p.distance_per_loop,
+                  list(p.x_vec), list(p.y_vec)) for p in game.player_list])
+
+    # ============= tests =============
+    def test_round_trip(self):
+        """Test that a restored game is the same as when it was
+        snapshot and plays on the same as one that never was"""
+        for collisions in ('segments', 'occupancy'):
+            game, other = new_game(collisions=collisions), new_game(collisions=collisions)
+            for g in (game, other):
+                self.play(g, 10, [(0, 'left')])
+            snapshot, expected = game.snapshot(), self.state(game)
+            self.play(game, 30, [(0, 'left'), (1, 'right')])
+            game.restore(snapshot)
+            self.assertEqual(self.state(game), expected)
+            for g in (game, other):
+                self.play(g, 40, [(1, 'left')])
+            self.assertEqual(self.state(game), self.state(other))
+
+    def test_shares_traces(self):
+        """Test that snapshots hold no trace and restore
+        cuts the same buffers back"""
+        game = new_game()
+        self.play(game, 5)
+        snapshot = game.snapshot()
+        x_vec = game.player_list[0].x_vec
+        self.play(game, 5, [(0, 'left'), (0, 'right')])
+        game.restore(snapshot)
+        self.assertIs(game.player_list[0].x_vec, x_vec)
+        self.assertEqual(snapshot.players[0].vertices, 1)
+
+    def test_rollbacks_bounded(self):
+        """Test that rolling back again and again leaves
+        no stale grid entries and holds a bounded lineage"""
+        game = new_game(size=600)
+        self.play(game, 5, [(0, 'left')])
+        snapshot = game.snapshot()
+        self.play(game, 5, [(0, 'right'), (1, 'left')])
+        entries = sum(len(e) for e in game.segment_grid.cells.values())
+        for _ in range(50):
+            game.restore(snapshot)
+            self.play(game, 5, [(0, 'right'), (1, 'left')])
+        self.assertEqual(sum(len(e) for e in game.segment_grid.cells.values()), entries)
+        for p in game.player_list:
+            self.assertLessEqual(len(p.lineage.lengths), 1)
+        self.assertLessEqual(len(game.log_lineage.lengths), 1)
+
+    def test_cut_away(self):
+        """Test that a state whose trace was cut away can't be
+        restored while earlier states still can"""
+        game = new_game()
+        first = game.snapshot()
+        self.play(game, 5, [(0, 'left')])
+        second = game.snapshot()
+        game.restore(first)
+        self.play(game, 5, [(0, 'right')])
+        with self.assertRaises(ValueError):
+            game.restore(second)
+        game.restore(first)
+        self.assertEqual(game.tick_count, 0)
+
+    def test_player(self):
+        """Test that a player can be snapshot on their own"""
+        p = Player()
+        p.set_starting_pos(0, 0)
+        snapshot = p.snapshot()
+        p.move()
+        p.turn_left()
+        p.update_score()
+        p.restore(snapshot)
+        self.assertEqual((p.x, p.y, p.heading, p.score, list(p.x_vec)), (0.0, 0.0, 0, 0, [0.0]))
+
+
+class TestImport(unittest.TestCase):
+    # ============= tests =============
+    def test_no_tk(self):
+        """Test that the headless modules import without turtle,
+        tkinter or numpy and that importing pytron stays cheap"""
+        for module in ('pytron', 'batch', 'rooms', 'bots', 'aio_pytron', 'recorder'):
+            result = run([sys.executable, '-X', 'importtime', '-c',
+                          f"import sys, {module}; print(sorted({{'turtle', 'tkinter', 'numpy'}} & set(sys.modules)))"],
+                         capture_output=True, text=True, cwd=dirname(abspath(__file__)))
+            self.assertEqual(result.stdout.strip(), '[]', module)
+            if module == 'pytron':  # cumulative microseconds, loosely bound by recorder's as machines vary
+                fields = [line.split('|') for line in result.stderr.splitlines()]
+                times = {f[2].strip(): int(f[1]) for f in fields if f[-1].strip() in ('pytron', 'recorder')}
+                self.assertLess(times['pytron'], 50*times['recorder'], f"pytron {times['pytron']} us, "
+                                f"recorder {times['recorder']} us")
+
+
+class TestFrameScheduler(unittest.TestCase):
+    # ============= setup =============
+    def setUp(self):
+        self.scheduler = FrameScheduler(tick_rate=10, render_rate=5)
+        self.scheduler.start(0.0)
+
+    # ============= tests =============
+    def test_advance(self):
+        """Test that elapsed time is spent in whole ticks"""
+        self.assertEqual(self.scheduler.advance(0.05), 0)
+        self.assertEqual(self.scheduler.advance(0.25), 2)
+        self.assertAlmostEqual(self.scheduler.lag, 0.05)
+        self.assertEqual(self.scheduler.advance(0.3), 1)
+
+    def test_advance_paused(self):
+        """Test that no ticks are owed while paused"""
+        self.assertEqual(self.scheduler.advance(10.0, paused=True), 0)
+        self.assertEqual(self.scheduler.advance(10.1), 1)
+
+    def test_advance_catch_up_limit(self):
+        """Test that a long stall doesn't cause a burst of ticks"""
+        self.assertEqual(self.scheduler.advance(10.0), FrameScheduler.max_catch_up)
+        self.assertEqual(self.scheduler.lag, 0.0)
+
+    def test_render_due(self):
+        """Test that frames are drawn at the render rate"""
+        self.assertTrue(self.scheduler.render_due(0.0))
+        self.assertFalse(self.scheduler.render_due(0.1))
+        self.assertTrue(self.scheduler.render_due(0.2))
+        self.assertTrue(self.scheduler.render_due(1.0))  # fell behind
+        self.assertFalse(self.scheduler.render_due(1.1))
+
+    def test_sleep_time(self):
+        """Test that the scheduler sleeps until the next deadline"""
+        self.scheduler.render_due(0.0)
+        self.assertAlmostEqual(self.scheduler.sleep_time(0.0), 0.1)
+        self.assertAlmostEqual(self.scheduler.sleep_time(0.0, paused=True), 0.2)
+
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
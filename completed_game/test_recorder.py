@@ -0,0 +1,102 @@
+#!../.venv/Scripts/python.exe
+import unittest
+from os import remove
+from tempfile import NamedTemporaryFile
+from importlib.util import find_spec
+from recorder import Recorder, Recording, load_records, RECORD, VERTEX, FREEZE, TICK, HEAD
+from fixtures import new_game
+
+
+class TestRecorder(unittest.TestCase):
+    # ============= setup =============
+    def setUp(self):
+        with NamedTemporaryFile(suffix='.bin', delete=False) as f:
+            self.path = f.name
+        # player 1 turns into player 2's line on the 10th tick
+        self.game = new_game()
+        self.game.attach_recorder(Recorder(self.path, batch_ticks=4))
+        for _ in range(10):
+            self.game.tick()
+        self.game.handle_input(0, 'left')
+        self.game.run_headless()
+        self.game.recorder.close(self.game)
+
+    def tearDown(self):
+        remove(self.path)
+
+    # ============= tests =============
+    def test_header(self):
+        recording = Recording(self.path)
+        self.assertEqual(recording.n_players, 2)
+        self.assertEqual((recording.width, recording.height), (300, 300))
+
+    def test_traces(self):
+        """Test that the traces read back match the players"""
+        traces = Recording(self.path).traces()
+        for (x_vec, y_vec), p in zip(traces, self.game.player_list):
+            self.assertEqual(list(x_vec), [x/p.units for x in p.get_trace()[0]])
+            self.assertEqual(list(y_vec), [y/p.units for y in p.get_trace()[1]])
+
+    def test_records(self):
+        """Test that the turn, the freeze and every tick were recorded"""
+        recording = Recording(self.path)
+        self.assertEqual(recording.ticks(), self.game.tick_count)
+        turn = [t for k, i, t in zip(recording.kind, recording.player, recording.tick)
+                if (k, i) == (VERTEX, 0)][-1]
+        self.assertEqual(turn, 10)
+        freezes = [i for k, i in zip(recording.kind, recording.player) if k == FREEZE]
+        self.assertEqual(freezes, [0])
+        self.assertEqual(list(recording.kind[-2:]), [HEAD, HEAD])
+
+    def test_partial_record(self):
+        """Test that a record cut short by a crash is ignored"""
+        n = len(Recording(self.path))
+        with open(self.path, 'ab') as f:
+            f.write(RECORD.pack(TICK, 0, 0, 0, 0)[:10])
+        self.assertEqual(len(Recording(self.path)), n)
+
+    def test_inputs(self):
+        """Test that the logged key presses replay the round"""
+        inputs = Recording(self.path).inputs()
+        self.assertEqual(inputs, [(10, 0, 'left')])
+        game = new_game(paused=True)
+        game.replay(inputs)
+        self.assertEqual(game.player_list[0].x_vec, self.game.player_list[0].x_vec)
+
+    @unittest.skipIf(find_spec('numpy') is None, "requires numpy")
+    def test_load_records(self):
+        """Test that the mapped records match the arrays"""
+        recording = Recording(self.path)
+        records = load_records(self.path)
+        self.assertEqual(list(records['kind']), list(recording.kind))
+        self.assertEqual(list(records['x']), list(recording.x))
+
+    def test_rewind(self):
+        """Test that what is played after a restore is recorded and
+        that the recording reads back as the restored round"""
+        with NamedTemporaryFile(suffix='.bin', delete=False) as f:
+            path = f.name
+        self.addCleanup(remove, path)
+        game = new_game()
+        game.attach_recorder(Recorder(path, batch_ticks=4))
+        for _ in range(5):
+            game.tick()
+        state = game.snapshot()
+        game.handle_input(0, 'left')
+        game.handle_input(0, 'left')
+        game.tick()
+        game.restore(state)
+        game.handle_input(0, 'right')
+        game.tick()
+        game.tick()
+        game.recorder.close(game)
+        recording = Recording(path)
+        self.assertEqual(recording.inputs(), game.input_log)
+        self.assertEqual(recording.ticks(), game.tick_count)
+        for (x_vec, y_vec), p in zip(recording.traces(), game.player_list):
+            self.assertEqual(list(x_vec), [x/p.units for x in p.get_trace()[0]])
+            self.assertEqual(list(y_vec), [y/p.units for y in p.get_trace()[1]])
+
+
+if __name__ == "__main__":
+    unittest.main()
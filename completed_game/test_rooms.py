@@ -0,0 +1,87 @@
+#!../.venv/Scripts/python.exe
+import asyncio
+import unittest
+from pytron import FrameScheduler
+from rooms import RoomManager, load_test
+from fixtures import new_game
+
+
+class TestRoomManager(unittest.TestCase):
+    # ============= setup =============
+    def setUp(self):
+        self.manager = RoomManager()
+        self.room_ids = [self.manager.create_room(2, width=300, height=300) for _ in range(3)]
+
+    # ============= tests =============
+    def test_paused_rooms_are_not_ticked(self):
+        """Test that only the rooms that were started are ticked"""
+        self.manager.join(self.room_ids[1], 0).press('pause')
+        self.assertEqual(list(self.manager.active), [self.room_ids[1]])
+        self.manager.step()
+        ticks = [self.manager.rooms[r].game.tick_count for r in self.room_ids]
+        self.assertEqual(ticks, [0, 1, 0])
+        self.assertEqual(self.manager.room_ticks, 1)
+
+    def test_pause_removes_room(self):
+        """Test that pausing a room drops it from the active set
+        at the next tick and starting it again brings it back"""
+        client = self.manager.join(self.room_ids[0], 0)
+        client.press('pause')
+        self.manager.step()
+        client.press('pause')
+        self.manager.step()
+        self.assertEqual(self.manager.active, {})
+        self.assertEqual(client.state()['tick'], 1)
+        client.press('pause')
+        self.assertIn(self.room_ids[0], self.manager.active)
+
+    def test_room_matches_game(self):
+        """Test that a room plays the same round as a
+        game given the same key presses on the same ticks"""
+        game = new_game()
+        clients = [self.manager.join(self.room_ids[0], i) for i in range(2)]
+        clients[0].press('pause')
+        while self.manager.active:
+            if game.tick_count == 20:
+                clients[0].press('left')
+                game.handle_input(0, 'left')
+            self.manager.step()
+            game.tick()
+        self.assertTrue(game.is_over())
+        self.assertEqual(clients[0].state()['tick'], game.tick_count)
+        self.assertEqual(clients[1].state()['players'],
+                         [(*p.get_pos(), p.heading, p.movable, p.score) for p in game.player_list])
+
+    def test_bad_presses_are_dropped(self):
+        """Test that presses for unknown players or actions are ignored"""
+        room_id = self.room_ids[0]
+        self.manager.send(room_id, 5, 'left')
+        self.manager.send(room_id, 0, 'jump')
+        self.assertEqual(self.manager.rooms[room_id].game.input_log, [])
+        self.assertEqual(self.manager.rooms[room_id].pending, [])
+
+    def test_close_room(self):
+        """Test that a closed room is forgotten"""
+        self.manager.join(self.room_ids[2], 0).press('pause')
+        self.manager.close_room(self.room_ids[2])
+        self.assertNotIn(self.room_ids[2], self.manager.rooms)
+        self.assertEqual(self.manager.active, {})
+
+    def test_run(self):
+        """Test that the shared scheduler ticks the active
+        rooms in real time until they are over"""
+        manager = RoomManager(FrameScheduler(tick_rate=1000, render_rate=100))
+        room_ids = [manager.create_room(2, width=40, height=40) for _ in range(2)]
+        [manager.join(r, 0).press('pause') for r in room_ids]
+        asyncio.run(manager.run(until=lambda: not manager.active))
+        self.assertEqual([manager.rooms[r].game.tick_count for r in room_ids], [10, 10])
+
+    def test_load_test(self):
+        """Test that the load test reports every room count"""
+        results = load_test(room_counts=(2, 4), ticks=5)
+        self.assertEqual([r['rooms'] for r in results], [2, 4])
+        self.assertEqual([r['room_ticks'] for r in results], [5, 10])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+#!../.venv/Scripts/python.exe
+import unittest
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+from bots import RandomBot
+from tournament import ResultsTable, Tournament, straight, wilson, mean_interval, ENTRANTS as REGISTERED
+
+
+ENTRANTS = {'straight': straight, 'random': RandomBot, 'random2': RandomBot}
+
+
+class TestResultsTable(unittest.TestCase):
+    # ============= setup =============
+    def setUp(self):
+        self.path = mkdtemp()
+
+    def tearDown(self):
+        rmtree(self.path)
+
+    # ============= tests =============
+    def test_append_and_load(self):
+        """Test that rows are stored column by column"""
+        table = ResultsTable(self.path)
+        table.append([(0, 0, 1, 2, -1, 50, 50, 50, 100.0, 100.0),
+                      (1, 0, 2, 1, 0, 70, 70, 60, 140.0, 120.0)])
+        columns = ResultsTable(self.path).load()
+        self.assertEqual(list(columns['seat0']), [1, 2])
+        self.assertEqual(list(columns['winner']), [-1, 0])
+        self.assertEqual(list(columns['score1']), [100.0, 120.0])
+
+    def test_repair(self):
+        """Test that a row only some columns hold is dropped"""
+        table = ResultsTable(self.path)
+        table.append([(0, 0, 1, 2, -1, 50, 50, 50, 100.0, 100.0)])
+        with open(join(self.path, 'ticks.col'), 'ab') as f:
+            f.write(bytes(6))  # a row and a half written before an interruption
+        table = ResultsTable(self.path)
+        self.assertEqual(table.rows, 1)
+        self.assertEqual(list(table.column('ticks')), [50])
+
+
+class TestTournament(unittest.TestCase):
+    # ============= setup =============
+    def setUp(self):
+        self.path = mkdtemp()
+
+    def tearDown(self):
+        rmtree(self.path)
+
+    def new(self, path=None, **kwargs):
+        kwargs = {'games': 4, 'workers': 1, 'chunk': 5, **kwargs}
+        return Tournament(path or self.path, ENTRANTS, **kwargs)
+
+    # ============= tests =============
+    def test_round_robin(self):
+        """Test that every pair plays games matches with the
+        seats swapped every other match"""
+        tournament = self.new()
+        self.assertEqual(tournament.run(), 12)
+        columns = tournament.table.load()
+        self.assertEqual(list(columns['match']), list(range(12)))
+        seats = list(zip(columns['seat0'], columns['seat1']))
+        self.assertEqual(seats[:4], [(0, 1), (1, 0), (0, 1), (1, 0)])
+        self.assertEqual(sorted(set(map(frozenset, seats))), sorted({frozenset(p) for p in [(0, 1), (0, 2), (1, 2)]}))
+
+    def test_resume(self):
+        """Test that an interrupted tournament carries on with the
+        same matches it would have played in one go"""
+        whole = self.new(mkdtemp())
+        whole.run()
+        played = []
+        while n := self.new(chunk=2).run(max_matches=5):
+            played.append(n)
+        self.assertEqual(played, [5, 5, 2])
+        self.assertEqual(self.new().table.load(), whole.table.load())
+        rmtree(whole.table.path)
+
+    def test_lookahead_deterministic(self):
+        """Test that the registered lookahead entrant plays
+        the same matches on every run"""
+        entrants = {name: REGISTERED[name] for name in ('straight', 'lookahead')}
+        tables = []
+        for path in (self.path, mkdtemp()):
+            played = Tournament(path, entrants, games=2, workers=1, max_ticks=300)
+            played.run()
+            tables.append(played.table.load())
+        rmtree(path)
+        self.assertEqual(tables[0], tables[1])
+
+    def test_other_tournament(self):
+        """Test that results aren't mixed with another tournament's"""
+        self.new()
+        with self.assertRaises(ValueError):
+            self.new(games=6)
+
+    def test_elimination(self):
+        """Test that the bracket gives the top seed a bye and
+        the winners play each other"""
+        tournament = self.new(mode='elimination', games=3)
+        self.assertEqual(tournament.first_round(), [[0], [1, 2]])
+        self.assertEqual(tournament.run(), 6)
+        columns = tournament.table.load()
+        self.assertEqual(list(columns['stage']), [0, 0, 0, 1, 1, 1])
+        final = {columns['seat0'][3], columns['seat1'][3]}
+        self.assertIn(0, final)
+        self.assertEqual(final - {0}, set(tournament.advance([[1, 2]], 0)))
+
+    def test_standings(self):
+        """Test that every match is counted once per seat"""
+        tournament = self.new(games=10)
+        tournament.run()
+        records = tournament.standings()
+        self.assertEqual([r['matches'] for r in records], [20, 20, 20])
+        for r in records:
+            self.assertEqual(r['wins'] + r['draws'] + r['losses'], r['matches'])
+            low, high = r['win_rate_ci']
+            self.assertTrue(low <= r['win_rate'] <= high)
+            self.assertEqual(len(r['score_deciles']), 9)
+        columns = tournament.table.load()
+        self.assertEqual(sum(r['wins'] for r in records), sum(w >= 0 for w in columns['winner']))
+
+    def test_intervals(self):
+        low, high = wilson(5, 10)
+        self.assertAlmostEqual(low, 0.2366, places=4)
+        self.assertAlmostEqual(high, 0.7634, places=4)
+        mean, (low, high) = mean_interval(10.0, 30.0, 4)  # values 1, 2, 3, 4
+        self.assertEqual(mean, 2.5)
+        self.assertAlmostEqual(high - mean, 1.96*(5/3/4)**0.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,309 @@
+# ================================================= #
+# Author: Samuel Law                                #
+# Title: Line Crossing Game - tournaments           #
+#                                                   #
+# Description:                                      #
+# Plays round robin or elimination tournaments      #
+# between controllers on the batch simulator and    #
+# keeps the results on disk as columns              #
+# ================================================= #
+
+import json
+import sys
+from argparse import ArgumentParser
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import count, islice
+from math import sqrt
+from os import cpu_count, makedirs, truncate
+from os.path import exists, getsize, join
+from statistics import quantiles
+from batch import GameConfig, play_headless
+from bots import RandomBot, LookaheadBot
+from pytron import Controller
+
+
+# ================== entrants ==================
+def straight(seed=None):
+    """Never turns"""
+    return Controller()
+
+
+ENTRANTS = {'straight': straight,
+            'random': RandomBot,
+            'lookahead': partial(LookaheadBot, depth=10, samples=6)}  # a fixed count, the clock isn't seeded
+
+
+# ================== classes ==================
+class ResultsTable():
+    """Match results on disk, one file of fixed size values per
+    column in native byte order. Rows are appended a chunk at a time
+    and a chunk cut short by an interruption is dropped on opening,
+    so the table always holds whole matches from the first one on."""
+    # class wide variables
+    columns = (('match', 'I'),      # match number
+               ('stage', 'H'),      # round of an elimination, 0 for round robin
+               ('seat0', 'H'),      # entrant playing player 1
+               ('seat1', 'H'),      # entrant playing player 2
+               ('winner', 'b'),     # seat that won, -1 for a draw
+               ('ticks', 'I'),      # ticks played
+               ('survival0', 'I'),  # ticks each seat survived
+               ('survival1', 'I'),
+               ('score0', 'f'),     # final score of each seat
+               ('score1', 'f'))
+
+    # methods
+    def __init__(self, path):
+        self.path = path
+        makedirs(path, exist_ok=True)
+        self.rows = self.repair()
+
+    def column_path(self, name):
+        return join(self.path, f'{name}.col')
+
+    def repair(self):
+        """Cuts every column back to the rows all of
+        them hold, returns the number of rows"""
+        sizes = {name: array(code).itemsize for name, code in self.columns}
+        paths = {name: self.column_path(name) for name in sizes}
+        rows = min((getsize(paths[name]) if exists(paths[name]) else 0)//sizes[name] for name in sizes)
+        for name in sizes:
+            with open(paths[name], 'ab'):  # create missing columns
+                pass
+            truncate(paths[name], rows*sizes[name])
+        return rows
+
+    def append(self, rows):
+        """Writes rows of values in column order"""
+        if not rows:
+            return
+        for name, code, values in zip(*zip(*self.columns), zip(*rows)):
+            with open(self.column_path(name), 'ab') as f:
+                array(code, values).tofile(f)
+        self.rows += len(rows)
+
+    def column(self, name, start=0, stop=None):
+        """Returns rows start to stop of a column as an array"""
+        code = dict(self.columns)[name]
+        values = array(code)
+        stop = self.rows if stop is None else min(stop, self.rows)
+        if stop > start:
+            with open(self.column_path(name), 'rb') as f:
+                f.seek(start*values.itemsize)
+                values.fromfile(f, stop - start)
+        return values
+
+    def load(self, start=0, stop=None):
+        """Returns a dict of name -> array of every column"""
+        return {name: self.column(name, start, stop) for name, _ in self.columns}
+
+
+class Tournament():
+    """Plays matches of two entrants, each a factory called with
+    factory(seed=...) that returns a Controller, as round robin
+    (every pair plays games matches) or a single elimination
+    bracket (pairs play games matches, the winner goes through).
+    Seats swap every other match. Match k is seeded from the seed
+    and k, so an interrupted tournament resumes where its table
+    stops and plays the same matches it would have played."""
+    # class wide variables
+    modes = ('round_robin', 'elimination')
+
+    # methods
+    def __init__(self, path, entrants, mode='round_robin', games=2, seed=0,
+                 width=300, height=300, max_ticks=10_000, workers=None, chunk=None):
+        if mode not in self.modes:
+            raise ValueError(f"unknown tournament mode {mode!r}")
+        self.names, self.factories = list(entrants), list(entrants.values())
+        self.mode, self.games, self.seed = mode, games, seed
+        self.width, self.height, self.max_ticks = width, height, max_ticks
+        self.workers = workers or cpu_count() or 1
+        self.chunk = chunk or 64*self.workers  # matches handed to the pool at a time
+        self.table = ResultsTable(path)
+        self.check_settings(join(path, 'tournament.json'))
+
+    def check_settings(self, path):
+        """Writes the settings next to a new table, raises
+        ValueError if the table is from another tournament"""
+        settings = {'entrants': self.names, 'mode': self.mode, 'games': self.games, 'seed': self.seed,
+                    'width': self.width, 'height': self.height, 'max_ticks': self.max_ticks}
+        if exists(path):
+            with open(path) as f:
+                if json.load(f) != settings:
+                    raise ValueError(f"{path} holds the results of another tournament")
+        else:
+            with open(path, 'w') as f:
+                json.dump(settings, f)
+
+    def config(self, k, seats):
+        """Returns the GameConfig of match k"""
+        return GameConfig(seed=(self.seed << 32) | k, width=self.width, height=self.height,
+                          max_ticks=self.max_ticks, controllers=tuple(self.factories[e] for e in seats))
+
+    def pairings(self, a, b):
+        """Yields the seats of the games between a and b"""
+        for g in range(self.games):
+            yield (a, b) if g % 2 == 0 else (b, a)
+
+    def stages(self):
+        """Yields (stage, [seats, ...]) for each stage, the
+        matches of a stage only depend on the earlier stages"""
+        n = len(self.names)
+        if self.mode == 'round_robin':
+            yield 0, (seats for a in range(n) for b in range(a + 1, n) for seats in self.pairings(a, b))
+            return
+        pairs, start, stage = self.first_round(), 0, 0
+        while len(pairs) > 1 or (pairs and len(pairs[0]) == 2):
+            matches = [seats for pair in pairs if len(pair) == 2 for seats in self.pairings(*pair)]
+            yield stage, matches
+            alive = self.advance(pairs, start)
+            pairs = [alive[i:i+2] for i in range(0, len(alive), 2)]
+            start += len(matches)
+            stage += 1
+
+    def first_round(self):
+        """Returns the pairs of the first round of the bracket,
+        entrant 0 is the top seed. The top seeds get a bye if
+        the number of entrants isn't a power of two."""
+        order = [0]
+        while len(order) < len(self.names):
+            order = [s for seed in order for s in (seed, 2*len(order) - 1 - seed)]
+        return [[e for e in order[i:i+2] if e < len(self.names)] for i in range(0, len(order), 2)]
+
+    def advance(self, pairs, start):
+        """Returns the winners of pairs, whose matches are
+        stored from row start on. The most wins goes through,
+        then the highest total score, then the higher seed."""
+        results = self.table.load(start, start + sum(self.games for pair in pairs if len(pair) == 2))
+        winners, k = [], 0
+        for pair in pairs:
+            if len(pair) == 1:  # a bye
+                winners.append(pair[0])
+                continue
+            wins, scores = {e: 0 for e in pair}, {e: 0.0 for e in pair}
+            for _ in range(self.games):
+                seats = (results['seat0'][k], results['seat1'][k])
+                if results['winner'][k] >= 0:
+                    wins[seats[results['winner'][k]]] += 1
+                scores[seats[0]] += results['score0'][k]
+                scores[seats[1]] += results['score1'][k]
+                k += 1
+            winners.append(max(pair, key=lambda e: (wins[e], scores[e], -e)))
+        return winners
+
+    def run(self, max_matches=None):
+        """Plays the matches the table doesn't hold yet, at most
+        max_matches of them, and returns the number played"""
+        done, played, numbers = self.table.rows, 0, count()
+        executor = ProcessPoolExecutor(self.workers) if self.workers > 1 else None
+        try:
+            for stage, matches in self.stages():
+                # number every match, the ones in the table were played before an interruption
+                todo = ((k, seats) for seats, k in zip(matches, numbers) if k >= done)
+                while played != max_matches:
+                    size = self.chunk if max_matches is None else min(self.chunk, max_matches - played)
+                    chunk = list(islice(todo, size))
+                    if not chunk:
+                        break
+                    configs = [self.config(k, seats) for k, seats in chunk]
+                    if executor:
+                        results = executor.map(play_headless, configs,
+                                               chunksize=max(1, len(configs)//(4*self.workers)))
+                    else:
+                        results = map(play_headless, configs)
+                    self.table.append([row(k, stage, seats, result) for (k, seats), result in zip(chunk, results)])
+                    played += len(chunk)
+                if played == max_matches:
+                    break
+        finally:
+            if executor:
+                executor.shutdown()
+        return played
+
+    def standings(self):
+        """Returns the statistics of each entrant, see standings"""
+        return standings(self.table, self.names)
+
+
+# ================== functions ==================
+def row(k, stage, seats, result):
+    """Returns the table row of match k from its GameResult"""
+    survival = [death[0] if death else result.ticks for death in result.deaths]
+    return (k, stage, *seats, -1 if result.winner is None else result.winner - 1,
+            result.ticks, *survival, *result.scores)
+
+
+def wilson(successes, n, z=1.96):
+    """Returns the Wilson score interval of a rate"""
+    if n == 0:
+        return (0.0, 1.0)
+    p = successes/n
+    center = (p + z*z/(2*n))/(1 + z*z/n)
+    half = (z/(1 + z*z/n))*sqrt(p*(1 - p)/n + z*z/(4*n*n))
+    return (max(center - half, 0.0), min(center + half, 1.0))
+
+
+def mean_interval(total, total_sq, n, z=1.96):
+    """Returns the mean and its normal approximation
+    interval from the sum and sum of squares of n values"""
+    if n == 0:
+        return 0.0, (0.0, 0.0)
+    mean = total/n
+    var = max(total_sq - n*mean*mean, 0.0)/(n - 1) if n > 1 else 0.0
+    half = z*sqrt(var/n)
+    return mean, (mean - half, mean + half)
+
+
+def standings(table, names):
+    """Returns a record per entrant of their matches, wins, draws and
+    losses, win rate with its 95% Wilson interval, mean survival ticks
+    and mean score with 95% intervals and the score deciles, in the
+    order of the most wins. Only the column sums and the scores of one
+    entrant at a time are held, not a row object per match."""
+    columns = table.load()
+    n = len(names)
+    matches, wins, draws = [0]*n, [0]*n, [0]*n
+    survival, survival_sq = [0.0]*n, [0.0]*n
+    scores = [array('f') for _ in range(n)]
+    for seat in (0, 1):
+        for entrant, winner, ticks, score in zip(columns[f'seat{seat}'], columns['winner'],
+                                                 columns[f'survival{seat}'], columns[f'score{seat}']):
+            matches[entrant] += 1
+            wins[entrant] += winner == seat
+            draws[entrant] += winner == -1
+            survival[entrant] += ticks
+            survival_sq[entrant] += ticks*ticks
+            scores[entrant].append(score)
+    records = []
+    for e, name in enumerate(names):
+        m = matches[e]
+        survival_mean, survival_ci = mean_interval(survival[e], survival_sq[e], m)
+        score_mean, score_ci = mean_interval(sum(scores[e]), sum(s*s for s in scores[e]), m)
+        records.append({'entrant': name, 'matches': m, 'wins': wins[e], 'draws': draws[e],
+                        'losses': m - wins[e] - draws[e], 'win_rate': wins[e]/m if m else 0.0,
+                        'win_rate_ci': wilson(wins[e], m), 'survival_mean': survival_mean,
+                        'survival_ci': survival_ci, 'score_mean': score_mean, 'score_ci': score_ci,
+                        'score_deciles': quantiles(scores[e], n=10) if m > 1 else list(scores[e])})
+    return sorted(records, key=lambda r: -r['wins'])
+
+
+def main(argv=None):
+    parser = ArgumentParser(description="Plays a pytron tournament between the built in entrants")
+    parser.add_argument('path', help="folder the results are kept in, an interrupted run resumes")
+    parser.add_argument('--mode', choices=Tournament.modes, default='round_robin')
+    parser.add_argument('--games', type=int, default=100, help="matches per pair")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--entrants', nargs='+', choices=list(ENTRANTS), default=['straight', 'random'])
+    parser.add_argument('--workers', type=int)
+    args = parser.parse_args(argv)
+
+    tournament = Tournament(args.path, {name: ENTRANTS[name] for name in args.entrants},
+                            mode=args.mode, games=args.games, seed=args.seed, workers=args.workers)
+    tournament.run()
+    for record in tournament.standings():
+        sys.stdout.write(json.dumps(record) + '\n')
+
+
+if __name__ == "__main__":
+    main()